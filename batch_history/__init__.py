@@ -2,6 +2,10 @@ from .main import (
     append_batch_job_history,
     append_uploaded_file_history,
     append_batch_file_history,
+    append_uploaded_files_history,
+    append_batch_files_history,
+    append_prompt_fanout,
+    get_prompt_fanout_by_job_id,
     get_batch_jobs_by_user_id,
     get_uploaded_files_by_job_id,
     get_file_ids_for_user_and_job,
@@ -11,9 +15,13 @@ from .main import (
     soft_delete_batch_file,
     get_openai_client,
     get_chunk_no_and_row_count,
+    get_chunk_details_for_file_ids,
     get_batch_status_and_output_file_id,
     update_batch_status_if_changed,
+    refresh_batch_statuses,
 )
+from .events import batch_event_bus
+from .poller import batch_status_poller
 from .router import batch_job_history_router
 
 
@@ -21,6 +29,10 @@ __all__ = [
     "append_batch_job_history",
     "append_uploaded_file_history",
     "append_batch_file_history",
+    "append_uploaded_files_history",
+    "append_batch_files_history",
+    "append_prompt_fanout",
+    "get_prompt_fanout_by_job_id",
     "get_batch_jobs_by_user_id",
     "get_uploaded_files_by_job_id",
     "get_file_ids_for_user_and_job",
@@ -31,6 +43,10 @@ __all__ = [
     "batch_job_history_router",
     "get_openai_client",
     "get_chunk_no_and_row_count",
+    "get_chunk_details_for_file_ids",
     "get_batch_status_and_output_file_id",
     "update_batch_status_if_changed",
+    "refresh_batch_statuses",
+    "batch_status_poller",
+    "batch_event_bus",
 ]
@@ -0,0 +1,62 @@
+import os
+import asyncio
+import logging
+import threading
+
+
+# Events buffered per subscriber before the oldest ones are dropped
+EVENT_QUEUE_SIZE = int(os.getenv("BATCH_EVENT_QUEUE_SIZE", "100"))
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of batch events, keyed by user_id.
+
+    Subscribers are asyncio queues living on the server's event loop;
+    `publish` may be called from any thread (the poller runs its refresh in a worker thread).
+    """
+
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        # user_id -> set of (loop, queue)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id), set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(str(user_id), None)
+
+    def has_subscribers(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                return bool(self._subscribers)
+            return str(user_id) in self._subscribers
+
+    @staticmethod
+    def deliver(queue, event):
+        # Slow consumer: drop its oldest event instead of blocking the publisher
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.deliver, queue, event)
+            except RuntimeError:
+                # Loop already closed
+                logging.debug(f"Dropping event for closed subscriber of user {user_id}")
+
+
+batch_event_bus = EventBus()
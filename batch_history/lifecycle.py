@@ -0,0 +1,68 @@
+from datetime import datetime
+
+
+# Lifecycle of a row in batch_files_AI_Portal, mirroring the Azure OpenAI batch states.
+#
+#   validating -> in_progress -> finalizing -> completed
+#        \______________\______________\_____-> failed / expired
+#   any pending state -> cancelling -> cancelled
+#
+# Polls can miss intermediate states, so every pending state may jump to any later one.
+# "invalid-batch-id" marks a batch Azure does not know about.
+PENDING_STATUSES = ("validating", "in_progress", "finalizing", "cancelling")
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled", "invalid-batch-id")
+
+ALLOWED_TRANSITIONS = {
+    "validating": {"in_progress", "finalizing", "completed", "failed", "expired", "cancelling", "cancelled"},
+    "in_progress": {"finalizing", "completed", "failed", "expired", "cancelling", "cancelled"},
+    "finalizing": {"completed", "failed", "expired", "cancelling", "cancelled"},
+    "cancelling": {"cancelled", "completed", "failed", "expired"},
+}
+
+
+def is_terminal(status):
+    return status in TERMINAL_STATUSES
+
+
+def is_pending(status):
+    return status in PENDING_STATUSES
+
+
+def can_transition(current, new):
+    """True if a batch stored as `current` may be updated to `new`."""
+    if current == new or is_terminal(current):
+        return False
+    if current not in ALLOWED_TRANSITIONS:
+        # Unknown/legacy stored status: trust Azure
+        return True
+    return new in ALLOWED_TRANSITIONS[current]
+
+
+def timestamp_to_iso(timestamp):
+    # Azure reports unix timestamps, the tables store ISO strings like created_at
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def request_counts_to_dict(request_counts):
+    if request_counts is None:
+        return None
+    return {
+        "total": request_counts.total,
+        "completed": request_counts.completed,
+        "failed": request_counts.failed,
+    }
+
+
+def batch_details(batch):
+    """The fields of an Azure batch object that are stored on its batch_files row."""
+    return {
+        "status": batch.status,
+        # output_file_id is only recorded once the batch is completed
+        "output_file_id": batch.output_file_id if batch.status == "completed" else None,
+        "error_file_id": getattr(batch, "error_file_id", None),
+        "request_counts": request_counts_to_dict(getattr(batch, "request_counts", None)),
+        "in_progress_at": timestamp_to_iso(getattr(batch, "in_progress_at", None)),
+        "completed_at": timestamp_to_iso(getattr(batch, "completed_at", None)),
+    }
@@ -1,9 +1,11 @@
+import os
+import json
 import uuid
-import pandas as pd
+import logging
 
 
 from datetime import datetime
-from openai import AzureOpenAI
+from common import get_azure_client
 
 
 from .utils import (
@@ -14,12 +16,20 @@ from .utils import (
     write_batch_files,
     read_batch_jobs,
     write_batch_jobs,
+    UPLOADED_FILES_TABLE,
+    BATCH_FILES_TABLE,
+    BATCH_JOBS_TABLE,
+    PROMPT_FANOUT_TABLE,
 )
+from database import repository
+from .lifecycle import PENDING_STATUSES as PENDING_BATCH_STATUSES, can_transition, batch_details
 
 
-def append_batch_job_history(user_id: str, job_data: dict):
-    df = read_batch_jobs()
+# Pages of client.batches.list scanned before falling back to batches.retrieve
+BATCH_LIST_MAX_PAGES = int(os.getenv("BATCH_LIST_MAX_PAGES", "20"))
+
 
+def append_batch_job_history(user_id: str, job_data: dict, uow=None):
     # Create a new job entry
     new_job = {
         "id": str(uuid.uuid4()),
@@ -39,11 +49,11 @@ def append_batch_job_history(user_id: str, job_data: dict):
         "deleted_at": None,
     }
 
-    # Append to DataFrame
-    df = pd.concat([df, pd.DataFrame([new_job])], ignore_index=True)
-
-    # Write back
-    write_batch_jobs(df)
+    # Insert only the new row (or queue it on the caller's unit of work)
+    if uow is not None:
+        uow.add(BATCH_JOBS_TABLE, new_job)
+    else:
+        repository.insert_rows(BATCH_JOBS_TABLE, [new_job])
 
     return {
         "status_code": 201,
@@ -53,13 +63,8 @@ def append_batch_job_history(user_id: str, job_data: dict):
     }
 
 
-def append_uploaded_file_history(
-    user_id: str, job_id: str, file_id: str, job_data: dict
-):
-    df = read_uploaded_files()
-
-    # Create a new job entry
-    new_job = {
+def build_uploaded_file_row(user_id: str, job_id: str, file_id: str, job_data: dict):
+    return {
         "file_id": file_id,
         "user_id": user_id,
         "job_id": job_id,
@@ -73,11 +78,14 @@ def append_uploaded_file_history(
         "deleted_at": None,
     }
 
-    # Append to DataFrame
-    df = pd.concat([df, pd.DataFrame([new_job])], ignore_index=True)
 
-    # Write back
-    write_uploaded_files(df)
+def append_uploaded_file_history(
+    user_id: str, job_id: str, file_id: str, job_data: dict
+):
+    new_job = build_uploaded_file_row(user_id, job_id, file_id, job_data)
+
+    # Insert only the new row
+    repository.insert_rows(UPLOADED_FILES_TABLE, [new_job])
 
     return {
         "status_code": 201,
@@ -88,13 +96,34 @@ def append_uploaded_file_history(
     }
 
 
-def append_batch_file_history(
+def append_uploaded_files_history(user_id: str, job_id: str, files_data: list, uow=None):
+    """
+    Multi-row variant of append_uploaded_file_history.
+    Each item of `files_data` is a job_data dict that also carries its "file_id".
+    If `uow` is given the rows are queued on it instead of being inserted right away.
+    """
+    new_rows = [
+        build_uploaded_file_row(user_id, job_id, file_data.get("file_id"), file_data)
+        for file_data in files_data
+    ]
+    if uow is not None:
+        uow.add_all(UPLOADED_FILES_TABLE, new_rows)
+    else:
+        repository.insert_rows(UPLOADED_FILES_TABLE, new_rows)
+
+    return {
+        "status_code": 201,
+        "message": f"{len(new_rows)} upload file history rows appended successfully",
+        "user_id": user_id,
+        "job_id": job_id,
+        "file_ids": [row["file_id"] for row in new_rows],
+    }
+
+
+def build_batch_file_row(
     user_id: str, job_id: str, file_id: str, batch_id: str, job_data: dict
 ):
-    df = read_batch_files()
-
-    # Create a new job entry
-    new_job = {
+    return {
         "batch_id": batch_id,
         "user_id": user_id,
         "job_id": job_id,
@@ -104,16 +133,23 @@ def append_batch_file_history(
         "status": job_data.get("batch_status", "validating"),
         "chunk_no": job_data.get("chunk_no", "chunk_1"),
         "total_rows_processed": job_data.get("total_rows_processed", 0),
+        "error_file_id": job_data.get("error_file_id", None),
+        "request_counts": job_data.get("request_counts", None),
+        "in_progress_at": job_data.get("in_progress_at", None),
+        "completed_at": job_data.get("completed_at", None),
         "created_at": datetime.now().isoformat(),
         "updated_at": datetime.now().isoformat(),
         "deleted_at": None,
     }
 
-    # Append to DataFrame
-    df = pd.concat([df, pd.DataFrame([new_job])], ignore_index=True)
 
-    # Write back
-    write_batch_files(df)
+def append_batch_file_history(
+    user_id: str, job_id: str, file_id: str, batch_id: str, job_data: dict
+):
+    new_job = build_batch_file_row(user_id, job_id, file_id, batch_id, job_data)
+
+    # Insert only the new row
+    repository.insert_rows(BATCH_FILES_TABLE, [new_job])
 
     return {
         "status_code": 201,
@@ -125,20 +161,83 @@ def append_batch_file_history(
     }
 
 
-def get_batch_jobs_by_user_id(user_id: str):
-    df = read_batch_jobs()
+def append_batch_files_history(user_id: str, job_id: str, batches_data: list, uow=None):
+    """
+    Multi-row variant of append_batch_file_history.
+    Each item of `batches_data` is a job_data dict that also carries its "batch_id" and "file_id".
+    If `uow` is given the rows are queued on it instead of being inserted right away.
+    """
+    new_rows = [
+        build_batch_file_row(
+            user_id, job_id, batch_data.get("file_id"), batch_data.get("batch_id"), batch_data
+        )
+        for batch_data in batches_data
+    ]
+    if uow is not None:
+        uow.add_all(BATCH_FILES_TABLE, new_rows)
+    else:
+        repository.insert_rows(BATCH_FILES_TABLE, new_rows)
+
+    return {
+        "status_code": 201,
+        "message": f"{len(new_rows)} batch file history rows appended successfully",
+        "user_id": user_id,
+        "job_id": job_id,
+        "batch_ids": [row["batch_id"] for row in new_rows],
+    }
 
-    # Filter jobs for this user_id and where deleted_at is NaN/null
-    user_jobs = df[(df["user_id"] == user_id) & (df["deleted_at"].isna())]
 
-    if user_jobs.empty:
+def append_prompt_fanout(user_id: str, job_id: str, fanout: list, uow=None):
+    """
+    Store the (custom_id, unique_id) pairs of a job uploaded with config.promptDedup "fanout".
+    If `uow` is given the rows are queued on it instead of being inserted right away.
+    """
+    created_at = datetime.now().isoformat()
+    new_rows = [
+        {
+            "user_id": user_id,
+            "job_id": job_id,
+            "custom_id": str(custom_id),
+            "unique_id": str(unique_id),
+            "created_at": created_at,
+        }
+        for custom_id, unique_id in fanout
+    ]
+    if uow is not None:
+        uow.add_all(PROMPT_FANOUT_TABLE, new_rows)
+    else:
+        repository.insert_rows(PROMPT_FANOUT_TABLE, new_rows)
+
+    return {
+        "status_code": 201,
+        "message": f"{len(new_rows)} prompt fanout rows appended successfully",
+        "user_id": user_id,
+        "job_id": job_id,
+    }
+
+
+def get_prompt_fanout_by_job_id(user_id: str, job_id: str):
+    """
+    Returns:
+        dict: custom_id -> list of the unique_ids that share its prompt (empty for jobs without fanout).
+    """
+    fanout = {}
+    for row in repository.get_prompt_fanout(user_id, job_id):
+        fanout.setdefault(row["custom_id"], []).append(row["unique_id"])
+    return fanout
+
+
+def get_batch_jobs_by_user_id(user_id: str):
+    # Fetch only this user's jobs where deleted_at is null
+    user_jobs = repository.get_batch_jobs(user_id)
+
+    if not user_jobs:
         return {
             "status_code": 404,
             "message": f"No batch jobs found for user_id {user_id}",
         }
 
-    # Convert each job row into dict
-    jobs_list = clean_nans(user_jobs.to_dict(orient="records"))
+    jobs_list = clean_nans(user_jobs)
 
     return {
         "status_code": 200,
@@ -150,23 +249,16 @@ def get_batch_jobs_by_user_id(user_id: str):
 
 
 def get_uploaded_files_by_job_id(user_id: str, job_id: str):
-    df = read_uploaded_files()
-
-    # Filter jobs for this user_id and where deleted_at is NaN/null
-    user_jobs = df[
-        (df["user_id"] == user_id)
-        & (df["job_id"] == job_id)
-        & (df["deleted_at"].isna())
-    ]
+    # Fetch only this job's files where deleted_at is null
+    user_jobs = repository.get_uploaded_files(user_id, job_id)
 
-    if user_jobs.empty:
+    if not user_jobs:
         return {
             "status_code": 404,
             "message": f"No uploaded files found for job_id {job_id}",
         }
 
-    # Convert each job row into dict
-    jobs_list = clean_nans(user_jobs.to_dict(orient="records"))
+    jobs_list = clean_nans(user_jobs)
 
     return {
         "status_code": 200,
@@ -179,51 +271,29 @@ def get_uploaded_files_by_job_id(user_id: str, job_id: str):
 
 
 def get_batch_files_by_job_id(user_id: str, job_id: str):
-    df = read_batch_files()
-
-    # Filter jobs for this user_id and where deleted_at is NaN/null
-    user_jobs = df[
-        (df["user_id"] == user_id)
-        & (df["job_id"] == job_id)
-        & (df["deleted_at"].isna())
-    ]
-
-    if user_jobs.empty:
-        return {
-            "status_code": 404,
-            "message": f"No batch files found for job_id {job_id}",
-        }
-
-    # Convert each job row into dict
-    jobs_list = clean_nans(user_jobs.to_dict(orient="records"))
-    list_of_batch_ids = [job["batch_id"] for job in jobs_list if "batch_id" in job] #type: ignore
-    from batch_process.main import check_status_of_batch_ids_of_job
-    check_status_of_batch_ids_of_job(user_id, job_id, list_of_batch_ids)
+    from .poller import batch_status_poller
 
-    updated_df = read_batch_files()
+    # Statuses are kept fresh by the background poller; without it, refresh this job inline
+    if not batch_status_poller.is_running():
+        refresh_batch_statuses(user_id, job_id)
 
-    # Filter jobs for this user_id and where deleted_at is NaN/null
-    updated_user_jobs = updated_df[
-        (updated_df["user_id"] == user_id)
-        & (updated_df["job_id"] == job_id)
-        & (updated_df["deleted_at"].isna())
-    ]
+    # Fetch only this job's batches where deleted_at is null
+    user_jobs = repository.get_batch_files(user_id, job_id)
 
-    if updated_user_jobs.empty:
+    if not user_jobs:
         return {
             "status_code": 404,
             "message": f"No batch files found for job_id {job_id}",
         }
-    
-    # Convert each job row into dict
-    updated_jobs_list = clean_nans(updated_user_jobs.to_dict(orient="records"))
+
+    jobs_list = clean_nans(user_jobs)
 
     return {
         "status_code": 200,
         "user_id": user_id,
         "job_id": job_id,
-        "jobs": updated_jobs_list,
-        "total_jobs": len(updated_jobs_list) if isinstance(updated_jobs_list, list) else 0,
+        "jobs": jobs_list,
+        "total_jobs": len(jobs_list) if isinstance(jobs_list, list) else 0,
         "message": "Batch files fetched successfully",
     }
 
@@ -322,92 +392,77 @@ def soft_delete_batch_file(user_id: str, batch_id: str):
 
 
 def get_openai_client(user_id, job_id):
-    df = read_batch_jobs()
-
-    # Filter the DataFrame based on user_id and job_id
-    filtered = df[
-        (df["user_id"] == user_id) & (df["id"] == job_id) & (df["deleted_at"].isna())
-    ]
+    first_row = repository.get_batch_job(user_id, job_id)
 
     # Check if any row matches
-    if not filtered.empty:
-        first_row = filtered.iloc[0]
-        return AzureOpenAI(
-            api_key=first_row["api_key"],
-            azure_endpoint=first_row["endpoint"],
-            api_version="2025-01-01-preview",
-        )
+    if first_row is not None:
+        return get_azure_client(first_row["endpoint"], first_row["api_key"])
     else:
         return None
 
 
 def get_chunk_no_and_row_count(user_id, job_id, file_id):
-    # Step 1: Read the DataFrame
-    df = read_uploaded_files()
-
-    # Step 2: Create a boolean mask for matching rows
-    mask = (
-        (df["user_id"] == user_id)
-        & (df["job_id"] == job_id)
-        & (df["file_id"] == file_id)
-        & (df["deleted_at"].isna())
-    )
+    # Step 1: Look up the matching (not deleted) rows
+    filtered = repository.get_uploaded_files(user_id, job_id, file_id)
 
-    # Step 3: Filter matching rows
-    filtered = df[mask]
-
-    # Step 4: If any match found, update and return details
-    if not filtered.empty:
+    # Step 2: If any match found, update and return details
+    if filtered:
         # Update batch_status to 'started'
-        df.loc[mask, "batch_status"] = "started"
-
-        # Write updated DataFrame back
-        write_uploaded_files(df)
+        repository.set_uploaded_file_batch_status(user_id, job_id, file_id, "started")
 
         # Get first matching row
-        first_row = filtered.iloc[0]
+        first_row = filtered[0]
         return first_row["chunk_no"], first_row["total_rows_processed"]
     else:
         return None, None
 
 
-def get_file_ids_for_user_and_job(user_id, job_id):
-    # Step 1: Read the DataFrame
-    df = read_uploaded_files()
+def get_chunk_details_for_file_ids(user_id, job_id, file_ids, uow=None):
+    """
+    Multi-file variant of get_chunk_no_and_row_count: one lookup for the whole job.
+    Marks every found file as batch_status 'started' (queued on `uow` if given).
 
-    # Step 2: Create a mask to filter matching rows (not deleted)
-    mask = (
-        (df["user_id"] == user_id)
-        & (df["job_id"] == job_id)
-        & (df["deleted_at"].isna())
-    )
+    Returns:
+        dict: {file_id: (chunk_no, total_rows_processed)}, (None, None) for unknown files.
+    """
+    rows_by_file_id = {}
+    for row in repository.get_uploaded_files(user_id, job_id):
+        rows_by_file_id.setdefault(row["file_id"], row)
+
+    chunk_details = {}
+    for file_id in file_ids:
+        row = rows_by_file_id.get(file_id)
+        if row is None:
+            chunk_details[file_id] = (None, None)
+            continue
+        chunk_details[file_id] = (row["chunk_no"], row["total_rows_processed"])
+        if uow is not None:
+            uow.update(UPLOADED_FILES_TABLE, "file_id", {"file_id": file_id, "batch_status": "started"})
+        else:
+            repository.set_uploaded_file_batch_status(user_id, job_id, file_id, "started")
 
-    # Step 3: Filter matching rows
-    filtered = df[mask]
+    return chunk_details
 
-    # Step 4: Return list of file_ids (unique)
-    if not filtered.empty:
-        file_ids = filtered["file_id"].unique().tolist()
+
+def get_file_ids_for_user_and_job(user_id, job_id):
+    # Step 1: Look up the matching (not deleted) rows
+    filtered = repository.get_uploaded_files(user_id, job_id)
+
+    # Step 2: Return list of file_ids (unique, in table order)
+    if filtered:
+        file_ids = list(dict.fromkeys(row["file_id"] for row in filtered))
         return file_ids
     else:
         return []
 
 
 def get_batch_status_and_output_file_id(user_id, job_id, batch_id):
-    # Step 1: Read the DataFrame
-    df = read_batch_files()
+    # Step 1: Look up the matching (not deleted) row
+    filtered = repository.get_batch_files(user_id, job_id, batch_id)
 
-    # Step 2: Filter for the matching row
-    filtered = df[
-        (df["user_id"] == user_id) &
-        (df["job_id"] == job_id) &
-        (df["batch_id"] == batch_id) &
-        (df["deleted_at"].isna())
-    ]
-
-    # Step 3: Check if any row matches
-    if not filtered.empty:
-        first_row = filtered.iloc[0]
+    # Step 2: Check if any row matches
+    if filtered:
+        first_row = filtered[0]
         result = {
             "status": first_row["status"],
             "batch_id": batch_id,
@@ -421,7 +476,7 @@ def get_batch_status_and_output_file_id(user_id, job_id, batch_id):
             "output_file_id": None
         }
 
-    # Step 4: Convert to JSON and return
+    # Step 3: Convert to JSON and return
     return result
 
 
@@ -452,8 +507,8 @@ def update_batch_status_if_changed(user_id, job_id, batch_id, latest_status, out
     if not df[mask].empty:
         current_status = df.loc[mask, "status"].iloc[0] #type: ignore
         
-        # Step 4: Update only if status is different
-        if current_status != latest_status:
+        # Step 4: Update only if status is different and the lifecycle allows it
+        if can_transition(current_status, latest_status):
             df.loc[mask, "status"] = latest_status
             
             # Update output_file_id if the status is completed and value is provided
@@ -462,3 +517,133 @@ def update_batch_status_if_changed(user_id, job_id, batch_id, latest_status, out
             
             # Step5: Write back to CSV
             write_batch_files(df)
+
+
+def list_remote_batches(client, batch_ids):
+    """
+    Page through client.batches.list (newest first) until every id of
+    `batch_ids` has been seen or BATCH_LIST_MAX_PAGES pages were read.
+    Ids not found in the listing are fetched one by one.
+
+    Returns:
+        dict: {batch_id: batch object}
+    """
+    wanted = set(batch_ids)
+    found = {}
+    page = client.batches.list(limit=100)
+    for _ in range(BATCH_LIST_MAX_PAGES):
+        for batch in page.data:
+            if batch.id in wanted:
+                found[batch.id] = batch
+        if len(found) == len(wanted) or not page.has_next_page():
+            break
+        page = page.get_next_page()
+
+    for batch_id in wanted - found.keys():
+        try:
+            found[batch_id] = client.batches.retrieve(batch_id)
+        except Exception as err:
+            # Keep the stored status, the next refresh will try again
+            logging.warning(f"Could not retrieve batch {batch_id}: {err}")
+    return found
+
+
+def refresh_batch_statuses(user_id=None, job_id=None):
+    """
+    Bring every pending batch (optionally of one user/job) up to date:
+    one batches.list scan per endpoint/api_key and one bulk UPDATE for all changes.
+
+    Returns:
+        list[dict]: The batches whose status changed, see refresh_pending_batches.
+    """
+    pending = repository.get_pending_batch_files(PENDING_BATCH_STATUSES, user_id, job_id)
+    return [
+        batch for batch in refresh_pending_batches(pending)
+        if batch["status"] != batch["previous_status"]
+    ]
+
+
+def refresh_pending_batches(pending):
+    """
+    refresh_batch_statuses for rows already loaded with repository.get_pending_batch_files.
+
+    Returns:
+        list[dict]: {"user_id", "job_id", "batch_id", "status", "previous_status",
+                     "output_file_id", "request_counts"} of every batch found on Azure.
+    """
+    batches_by_account = {}
+    for row in pending:
+        batches_by_account.setdefault((row["endpoint"], row["api_key"]), []).append(row)
+
+    observed = []
+    updates = []
+    for (endpoint, api_key), rows in batches_by_account.items():
+        try:
+            remote = list_remote_batches(
+                get_azure_client(endpoint, api_key), [row["batch_id"] for row in rows]
+            )
+        except Exception as err:
+            logging.warning(f"Could not list batches of {endpoint}: {err}")
+            continue
+
+        for row in rows:
+            batch = remote.get(row["batch_id"])
+            if batch is None:
+                continue
+            details = batch_details(batch)
+            if details["status"] != row["status"] and not can_transition(row["status"], details["status"]):
+                logging.warning(f"Ignoring transition {row['status']} -> {details['status']} of batch {row['batch_id']}")
+                continue
+            if details["output_file_id"] is None:
+                details["output_file_id"] = row["output_file_id"]
+            observed.append(
+                {
+                    "user_id": row["user_id"],
+                    "job_id": row["job_id"],
+                    "batch_id": row["batch_id"],
+                    "previous_status": row["status"],
+                    **details,
+                }
+            )
+
+            changed = {
+                col: value for col, value in details.items()
+                if stored_value(row, col) != value
+            }
+            if changed:
+                updates.append({"batch_id": row["batch_id"], **changed})
+
+    # Rows setting the same columns share one bulk UPDATE
+    repository.update_rows(BATCH_FILES_TABLE, "batch_id", updates)
+    return observed
+
+
+def stored_value(row, column):
+    """Value of `column` in a batch_files row, in the shape batch_details() reports it."""
+    value = row.get(column)
+    if column == "request_counts" and isinstance(value, str):
+        # Stored as a JSON string
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def get_batch_events_snapshot(user_id, job_id=None):
+    """
+    Current state of the user's batches (or of one job's), shaped like the events the
+    poller publishes, so a new event stream starts from what is already stored.
+    """
+    return [
+        {
+            "job_id": row["job_id"],
+            "batch_id": row["batch_id"],
+            "status": row["status"],
+            "request_counts": stored_value(row, "request_counts"),
+            "output_file_id": row.get("output_file_id"),
+        }
+        for row in repository.get_batch_files(user_id, job_id)
+    ]
@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+import logging
+
+
+from database import repository
+from .events import batch_event_bus
+from .main import PENDING_BATCH_STATUSES, refresh_pending_batches
+
+
+# Set BATCH_STATUS_POLLER=false to refresh statuses on request instead (e.g. for extra workers)
+BATCH_STATUS_POLLER = os.getenv("BATCH_STATUS_POLLER", "true").lower() in ("1", "true", "yes", "on")
+# A batch is checked again after POLL_MIN_INTERVAL seconds, doubling up to
+# POLL_MAX_INTERVAL while its status does not change
+POLL_MIN_INTERVAL = float(os.getenv("BATCH_POLL_MIN_INTERVAL", "10"))
+POLL_MAX_INTERVAL = float(os.getenv("BATCH_POLL_MAX_INTERVAL", "300"))
+
+
+def poller_enabled():
+    return BATCH_STATUS_POLLER
+
+
+class BatchStatusPoller:
+    """
+    Background task that keeps the status of pending batches in batch_files_AI_Portal up to date,
+    so the history endpoints can answer from the database alone.
+
+    Every POLL_MIN_INTERVAL seconds it loads the pending batches and refreshes the ones
+    that are due. Status, request_counts and output_file_id changes are published on
+    `batch_event_bus` for the SSE stream. Each worker process runs its own poller.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        # batch_id -> (current interval, next check time)
+        self.schedule = {}
+        # batch_id -> last published (status, request_counts, output_file_id)
+        self.published = {}
+        self._task = None
+
+    def due_batches(self, pending, now):
+        pending_ids = {row["batch_id"] for row in pending}
+        # Forget batches that finished or were deleted
+        for batch_id in [batch_id for batch_id in self.schedule if batch_id not in pending_ids]:
+            del self.schedule[batch_id]
+            self.published.pop(batch_id, None)
+
+        return [
+            row for row in pending
+            if self.schedule.get(row["batch_id"], (None, 0.0))[1] <= now
+        ]
+
+    def reschedule(self, checked, changes, now):
+        changed_ids = {change["batch_id"] for change in changes}
+        for row in checked:
+            batch_id = row["batch_id"]
+            if batch_id in changed_ids or batch_id not in self.schedule:
+                interval = self.min_interval
+            else:
+                # Unchanged since the last check: back off
+                interval = min(self.schedule[batch_id][0] * 2, self.max_interval)
+            self.schedule[batch_id] = (interval, now + interval)
+
+    def publish(self, observed):
+        for batch in observed:
+            state = (batch["status"], batch["request_counts"], batch["output_file_id"])
+            if self.published.get(batch["batch_id"]) == state and batch["status"] == batch["previous_status"]:
+                continue
+            self.published[batch["batch_id"]] = state
+            batch_event_bus.publish(
+                batch["user_id"],
+                {
+                    "job_id": batch["job_id"],
+                    "batch_id": batch["batch_id"],
+                    "status": batch["status"],
+                    "request_counts": batch["request_counts"],
+                    "output_file_id": batch["output_file_id"],
+                },
+            )
+
+    def poll_once(self):
+        now = time.monotonic()
+        pending = repository.get_pending_batch_files(PENDING_BATCH_STATUSES)
+        due = self.due_batches(pending, now)
+        if not due:
+            return []
+
+        observed = refresh_pending_batches(due)
+        changes = [batch for batch in observed if batch["status"] != batch["previous_status"]]
+        self.reschedule(due, changes, now)
+        self.publish(observed)
+        if changes:
+            logging.info(f"Batch poller: {len(changes)} of {len(due)} checked batches changed")
+        return changes
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.poll_once)
+            except Exception as err:
+                logging.exception(f"Batch poller iteration failed: {err}")
+            await asyncio.sleep(self.min_interval)
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self._task is None and poller_enabled():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+batch_status_poller = BatchStatusPoller()
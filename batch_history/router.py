@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Response, HTTPException
+import os
+import json
+import asyncio
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 
 
 from .main import (
@@ -8,15 +12,20 @@ from .main import (
     get_batch_jobs_by_user_id,
     get_uploaded_files_by_job_id,
     get_batch_files_by_job_id,
+    get_batch_events_snapshot,
     soft_delete_batch_job,
     soft_delete_uploaded_file,
     soft_delete_batch_file,
 )
+from .events import batch_event_bus
 from login_setup.main import authenticate_user_token
 
 
 batch_job_history_router = APIRouter()
 
+# Seconds between keep-alive comments on an idle event stream
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
 
 @batch_job_history_router.get("/history/batch-job/")
 def get_batch_jobs(user_id: str, access_token: str, response: Response):
@@ -54,6 +63,40 @@ def get_created_batch(user_id: str, access_token: str, job_id: str, response: Re
         return result
 
 
+@batch_job_history_router.get("/history/batch-events/")
+async def stream_batch_events(user_id: str, access_token: str, request: Request, job_id: str = None):
+    # Validate user_id and access_token  and status active
+    if not await asyncio.to_thread(authenticate_user_token, user_id, access_token):
+        raise HTTPException(status_code=401, detail="Unauthorized User")
+
+    def batch_event(event):
+        return f"event: batch_status\ndata: {json.dumps(event, default=str)}\n\n"
+
+    async def event_stream():
+        # Subscribed before the snapshot is read, so no change in between is missed
+        queue = batch_event_bus.subscribe(user_id)
+        try:
+            for event in await asyncio.to_thread(get_batch_events_snapshot, user_id, job_id):
+                yield batch_event(event)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if job_id is not None and str(event["job_id"]) != job_id:
+                    continue
+                yield batch_event(event)
+        finally:
+            batch_event_bus.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @batch_job_history_router.delete("/delete/batch-job/")
 def soft_delete_batch_jobs_by_job_id(user_id: str, job_id: str, access_token: str, response: Response):
     # Validate user_id and access_token  and status active
@@ -3,24 +3,70 @@ import logging
 from batch_history import (
     append_batch_job_history,
     append_uploaded_file_history,
-    append_batch_file_history,
+    append_uploaded_files_history,
+    append_batch_files_history,
+    append_prompt_fanout,
+    get_prompt_fanout_by_job_id,
     get_openai_client,
 )
-from .utils import convert_df_to_bytes
+from database.unit_of_work import UnitOfWork
+from .utils import convert_df_to_bytes, convert_csv_file_to_bytes
 from . import steps
-from .steps.batch_status import check_batch_progress
 from batch_history import (
-    get_batch_status_and_output_file_id,
-    update_batch_status_if_changed,
     get_file_ids_for_user_and_job,
+    refresh_batch_statuses,
 )
+from database import repository
 
 
-def batch_processing_create_and_upload_file(user_id, filename, df, description_json):
-    output_df = steps.create_file.start_process(df, description_json["unique_id_field"], description_json["prompt"], description_json["placeholder_field"])
-    uploaded_files_list = steps.upload_file.start_process(
-        output_df, filename, description_json
-    )
+def build_batches_data(batch_files_list):
+    # Started batches (see steps.start_batch_job) -> rows for append_batch_files_history
+    return [
+        {
+            "job_type": "batch-job",
+            "batch_id": batch_data.get("batch_id", None),
+            "file_id": batch_data.get("file_id", None),
+            "batch_status": batch_data.get("status"),
+            "chunk_no": batch_data.get("chunk_no"),
+            "total_rows_processed": batch_data.get("total_rows_processed"),
+            "output_file_id": batch_data.get("output_file_id"),
+            "error_file_id": batch_data.get("error_file_id"),
+            "request_counts": batch_data.get("request_counts"),
+            "in_progress_at": batch_data.get("in_progress_at"),
+            "completed_at": batch_data.get("completed_at"),
+        }
+        for batch_data in batch_files_list
+    ]
+
+
+def log_unrecorded_batches(user_id, job_id, batch_files_list):
+    # The batches run (and bill) in Azure even though their rows were not written,
+    # keep their IDs in the log so they can be found and recorded or cancelled
+    batch_ids = [batch_data.get("batch_id") for batch_data in batch_files_list]
+    if batch_ids:
+        logging.error(
+            f"Started batches of user {user_id}, job {job_id} were not recorded: {batch_ids}"
+        )
+
+
+def uploaded_file_ids(list_of_file_ids):
+    # Chunks that failed to upload have no file_id, there is nothing to start for them
+    # and their rows must not end up in (and fail) the unit of work of the started ones
+    file_ids = [file_id for file_id in list_of_file_ids if file_id]
+    if len(file_ids) < len(list_of_file_ids):
+        logging.warning(f"Skipped {len(list_of_file_ids) - len(file_ids)} chunks that were not uploaded")
+    return file_ids
+
+
+def batch_processing_create_and_upload_file(user_id, filename, file, description_json):
+    # The upload is cleaned, rendered and serialized chunk by chunk, never loaded whole
+    # Each chunk goes to the upload pool as soon as its rows are rendered
+    upload, chunks = steps.stream_file.start_process(file, filename, description_json)
+    # config.autoStart: start each chunk's batch as soon as the chunk is uploaded
+    auto_start = description_json.get("config", {}).get("autoStart", False)
+    uploaded_files_list = steps.pipeline.start_process(chunks, filename, description_json)
+    # Complete now that every chunk was taken
+    prepared = upload.summary()
 
     job_data = {
         "job_title": description_json.get("job_title", None),
@@ -28,29 +74,60 @@ def batch_processing_create_and_upload_file(user_id, filename, df, description_j
         "job_type": "batch-job",
         "chunk_size": description_json.get("config", {}).get("chunkSize", 0),
         "chunks": len(uploaded_files_list),
-        "total_rows_processed": len(output_df),
+        "total_rows_processed": prepared["total_rows"],
         "model": description_json.get("credentials", {}).get("deploymentName", "N/A"),
         "endpoint": description_json.get("credentials", {}).get("endpoint", "N/A"),
         "api_key": description_json.get("credentials", {}).get("apiKey", "N/A"),
         "prompt": description_json.get("prompt", None),
     }
-    batch_job_data = append_batch_job_history(user_id, job_data)
-
-    for file_data in uploaded_files_list:
-        file_id = file_data.get("file_id", None)
-        job_data["file_status"] = file_data.get("status")
-        job_data["batch_status"] = "not_started"
-        job_data["chunk_no"] = file_data.get("chunk_no")
-        job_data["total_rows_processed"] = file_data.get("total_rows_processed")
+    started_batches = [
+        {**file_data["batch"], "chunk_no": file_data["chunk_no"], "total_rows_processed": file_data["total_rows_processed"]}
+        for file_data in uploaded_files_list
+        if file_data.get("batch")
+    ]
+    batch_job_data = {}
+    try:
+        with UnitOfWork() as uow:
+            batch_job_data = append_batch_job_history(user_id, job_data, uow=uow)
 
-        append_uploaded_file_history(
-            user_id, batch_job_data["job_id"], file_id, job_data
-        )
+            files_data = [
+                {
+                    **job_data,
+                    "file_id": file_data.get("file_id", None),
+                    "file_status": file_data.get("status"),
+                    "batch_status": "started" if file_data.get("batch") else "not_started",
+                    "chunk_no": file_data.get("chunk_no"),
+                    "total_rows_processed": file_data.get("total_rows_processed"),
+                }
+                for file_data in uploaded_files_list
+            ]
+            append_uploaded_files_history(
+                user_id, batch_job_data["job_id"], files_data, uow=uow
+            )
+            if started_batches:
+                append_batch_files_history(
+                    user_id, batch_job_data["job_id"], build_batches_data(started_batches), uow=uow
+                )
+            if prepared["fanout"]:
+                append_prompt_fanout(user_id, batch_job_data["job_id"], prepared["fanout"], uow=uow)
+    except Exception:
+        log_unrecorded_batches(user_id, batch_job_data.get("job_id"), started_batches)
+        raise
 
-    output_json = convert_df_to_bytes(output_df)
+    output_json = convert_csv_file_to_bytes(
+        prepared["csv"], prepared["total_rows"], prepared["preview"]
+    )
     output_json["job_id"] = batch_job_data["job_id"]
     output_json["chunks"] = len(uploaded_files_list)
     output_json["job_title"] = description_json.get("job_title", None),
+    output_json["dropped_rows"] = prepared["dropped_rows"]
+    output_json["failed_chunks"] = [
+        {"chunk_no": file_data["chunk_no"], "error": file_data["error"]}
+        for file_data in uploaded_files_list
+        if file_data.get("error")
+    ]
+    if auto_start:
+        output_json["batch_count"] = len(started_batches)
     return output_json
 
 
@@ -87,19 +164,18 @@ def batch_processing_upload_file(user_id, filename, df, description_json):
 
 
 def start_batch_of_file_ids(user_id, job_id, list_of_file_ids):
-    batch_files_list = steps.start_batch_job.start_process(
-        user_id, job_id, list_of_file_ids
-    )
-    job_data = {"job_type": "batch-job"}
-    for batch_data in batch_files_list:
-        batch_id = batch_data.get("batch_id", None)
-        file_id = batch_data.get("file_id", None)
-        job_data["status"] = batch_data.get("status")
-        job_data["chunk_no"] = batch_data.get("chunk_no")
-        job_data["total_rows_processed"] = batch_data.get("total_rows_processed")
-        job_data["output_file_id"] = batch_data.get("output_file_id")
-
-        append_batch_file_history(user_id, job_id, file_id, batch_id, job_data)
+    list_of_file_ids = uploaded_file_ids(list_of_file_ids)
+    batch_files_list = []
+    try:
+        with UnitOfWork() as uow:
+            batch_files_list = steps.start_batch_job.start_process(
+                user_id, job_id, list_of_file_ids, uow=uow
+            )
+            batches_data = build_batches_data(batch_files_list)
+            append_batch_files_history(user_id, job_id, batches_data, uow=uow)
+    except Exception:
+        log_unrecorded_batches(user_id, job_id, batch_files_list)
+        raise
     return {
         "batch_count": len(batch_files_list),
         "message": f"{len(batch_files_list)} has been started, check progress in batch status tab",
@@ -107,20 +183,18 @@ def start_batch_of_file_ids(user_id, job_id, list_of_file_ids):
 
 
 def start_batch_of_job_id(user_id, job_id):
-    list_of_file_ids = get_file_ids_for_user_and_job(user_id, job_id)
-    batch_files_list = steps.start_batch_job.start_process(
-        user_id, job_id, list_of_file_ids
-    )
-    job_data = {"job_type": "batch-job"}
-    for batch_data in batch_files_list:
-        batch_id = batch_data.get("batch_id", None)
-        file_id = batch_data.get("file_id", None)
-        job_data["status"] = batch_data.get("status")
-        job_data["chunk_no"] = batch_data.get("chunk_no")
-        job_data["total_rows_processed"] = batch_data.get("total_rows_processed")
-        job_data["output_file_id"] = batch_data.get("output_file_id")
-
-        append_batch_file_history(user_id, job_id, file_id, batch_id, job_data)
+    list_of_file_ids = uploaded_file_ids(get_file_ids_for_user_and_job(user_id, job_id))
+    batch_files_list = []
+    try:
+        with UnitOfWork() as uow:
+            batch_files_list = steps.start_batch_job.start_process(
+                user_id, job_id, list_of_file_ids, uow=uow
+            )
+            batches_data = build_batches_data(batch_files_list)
+            append_batch_files_history(user_id, job_id, batches_data, uow=uow)
+    except Exception:
+        log_unrecorded_batches(user_id, job_id, batch_files_list)
+        raise
     return {
         "batch_count": len(batch_files_list),
         "message": f"{len(batch_files_list)} has been started, check progress in batch status tab",
@@ -130,23 +204,21 @@ def start_batch_of_job_id(user_id, job_id):
 def check_status_of_batch_ids_of_job(user_id, job_id, list_of_batch_ids):
     client = get_openai_client(user_id, job_id)
     if client:
+        # One listing + one bulk write for all pending batches of the job
+        refresh_batch_statuses(user_id, job_id)
+        batch_files = {
+            row["batch_id"]: row for row in repository.get_batch_files(user_id, job_id)
+        }
         list_of_all_batch_status = []
         for batch_id in list_of_batch_ids:
-            batch_status = get_batch_status_and_output_file_id(
-                user_id, job_id, batch_id
+            row = batch_files.get(batch_id, {})
+            list_of_all_batch_status.append(
+                {
+                    "status": row.get("status"),
+                    "batch_id": batch_id,
+                    "output_file_id": row.get("output_file_id"),
+                }
             )
-            if batch_status["status"] != "completed":
-                current_batch_status = check_batch_progress(client, batch_id)
-                batch_status["status"] = current_batch_status["status"]
-                batch_status["output_file_id"] = current_batch_status["output_file_id"]
-                update_batch_status_if_changed(
-                    user_id,
-                    job_id,
-                    batch_id,
-                    latest_status=current_batch_status["status"],
-                    output_file_id=current_batch_status.get("output_file_id"),
-                )
-            list_of_all_batch_status.append(batch_status)
         return {
             "status_code": 200,
             "user_id": user_id,
@@ -198,10 +270,12 @@ def download_input_csv_file_of_file_ids(user_id, job_id, list_of_file_ids):
 def download_output_csv_file_of_batch_ids(user_id, job_id, list_of_batch_ids):
     client = get_openai_client(user_id, job_id)
     if client:
+        # Results of prompts sent once for several rows are copied to all of them
+        fanout = get_prompt_fanout_by_job_id(user_id, job_id)
         list_of_all_input_files_data = []
         for batch_id in list_of_batch_ids:
             output_dataframe_json = steps.download_file.download_csv_of_batch_id(
-                client, batch_id
+                client, batch_id, fanout=fanout
             )
             if output_dataframe_json.get("file_dataframe") is not None:
                 dataframe_bytes_and_data = convert_df_to_bytes(
@@ -1,9 +1,11 @@
 import pandas as pd
 import io
 import json
+import asyncio
 
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 
@@ -16,7 +18,9 @@ from .main import (
     download_input_csv_file_of_file_ids,
     download_output_csv_file_of_batch_ids,
 )
+from .utils import stream_json_with_file
 from login_setup import authenticate_user_token
+from common.ingest import file_kind, UnsupportedFileType
 
 
 batch_process_router = APIRouter()
@@ -43,24 +47,27 @@ async def create_and_upload_file(
             response.status_code = 400
             raise HTTPException(status_code=400, detail="Invalid JSON in description")
 
-        contents = await file.read()
-
         # Decide based on file extension
-        if file.filename and file.filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(contents))
-        elif file.filename and (
-            file.filename.endswith(".xlsx") or file.filename.endswith(".xls")
-        ):
-            df = pd.read_excel(io.BytesIO(contents), engine="openpyxl")
-        else:
+        try:
+            file_kind(file.filename)
+        except UnsupportedFileType:
             response.status_code = 400
             raise HTTPException(status_code=400, detail="Unsupported file type")
-        result = batch_processing_create_and_upload_file(
-            user_id, file.filename, df, description_json
-        )
+
+        # file.file is the spooled upload, it is read chunk by chunk off the event loop
+        try:
+            result = await asyncio.to_thread(
+                batch_processing_create_and_upload_file,
+                user_id, file.filename, file.file, description_json
+            )
+        except ValueError as err:
+            # e.g. a mapped column that is not in the file
+            response.status_code = 400
+            raise HTTPException(status_code=400, detail=str(err))
         response.status_code = 200
         result["message"] = "Data pre-processing and upload done"
-        return result
+        # The rendered CSV (file_data) is encoded while it is sent, it can be larger than memory
+        return StreamingResponse(stream_json_with_file(result), media_type="application/json")
 
 
 class StartBatchModel(BaseModel):
@@ -236,7 +243,9 @@ async def download_output_csv_file(
     "unique_id_field": "national_catid",
     "output_field": {"suggested_five_keywords": "list of 5 keywords"},
     "config": {
-      "chunkSize": 20
+      "chunkSize": 20,
+      "autoStart": false,
+      "promptDedup": "off"
     },
     "credentials": { "apiKey": "49399de06f4c413db072e580c470b443", "endpoint": "https://gpt4omini-exp.openai.azure.com/",  "deploymentName": "gpt4omini-exp", "temperature": 0.7}
 }
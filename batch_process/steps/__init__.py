@@ -3,6 +3,9 @@ from . import upload_file
 from . import start_batch_job
 from . import download_file
 from . import batch_status
+from . import pipeline
+from . import stream_file
+from . import dedup
 
 
 __all__ = [
@@ -11,4 +14,7 @@ __all__ = [
     "start_batch_job",
     "download_file",
     "batch_status",
+    "pipeline",
+    "stream_file",
+    "dedup",
 ]
@@ -1,7 +1,6 @@
 # Import necessary libraries
 import os
 import logging
-import re
 import pandas as pd
 import json
 import time
@@ -11,22 +10,29 @@ from openai import AzureOpenAI
 from datetime import datetime
 
 
-def clean_dataframe(dataframe, unique_id_column_name):
+from common.prompt_template import render_prompts as render_template_prompts
+from .dedup import Deduplicator
+
+
+def clean_dataframe(dataframe, unique_id_column_name, deduplicator=None):
     """
-    Cleans a DataFrame by:
+    Cleans a DataFrame in place by:
     1. Removing rows where the unique ID is NaN or 0.
     2. Keeping only unique IDs (drop duplicates).
     3. Dropping fully duplicated rows across all other columns.
+    Duplicates are found on 64-bit row hashes, see Deduplicator.
 
     Parameters:
         dataframe (pd.DataFrame): Input DataFrame.
         unique_id_column_name (str): Name of the unique ID column.
+        deduplicator (Deduplicator): Dedup state shared between the chunks of one file,
+            its `dropped` counts report the dropped rows per reason.
 
     Returns:
         pd.DataFrame: Cleaned DataFrame.
     """
 
-    df = dataframe.copy()  # avoid modifying original
+    df = dataframe
 
     # ---- NEW: Handle null unique_id_column ----
     if not unique_id_column_name:
@@ -42,39 +48,9 @@ def clean_dataframe(dataframe, unique_id_column_name):
         # Assign incrementing integers as the unique ID
         df[unique_id_column_name] = range(1, len(df) + 1)
 
-    # 1️⃣ Drop rows where the unique ID is NaN
-    df.dropna(subset=[unique_id_column_name], inplace=True)
-
-    # 2️⃣ Drop rows where the unique ID is 0
-    df = df[df[unique_id_column_name] != 0]
-
-    # 3️⃣ Drop duplicate IDs, keep first occurrence
-    df.drop_duplicates(subset=[unique_id_column_name], keep="first", inplace=True)
-
-    # 4️⃣ Drop fully duplicated rows across all columns except unique ID
-    other_columns = df.columns.difference([unique_id_column_name])
-    df.drop_duplicates(subset=other_columns, inplace=True)
-
-    # Reset index
-    df.reset_index(drop=True, inplace=True)
-
-    return df
-
-
-def add_prompt_column(dataframe, prompt, prompt_column_name="prompt"):
-    """
-    Adds a new column to the DataFrame, filling all rows with the same prompt text.
-
-    Parameters:
-        df (pd.DataFrame): The input DataFrame.
-        prompt (str): The text to fill in the new column.
-        prompt_column_name (str): Name of the new column (default: 'prompt').
-
-    Returns:
-        pd.DataFrame: DataFrame with the new column added.
-    """
-    dataframe[prompt_column_name] = prompt
-    return dataframe
+    if deduplicator is None:
+        deduplicator = Deduplicator()
+    return deduplicator.clean(df, unique_id_column_name)
 
 
 def replace_placeholders_with_col_values(
@@ -93,22 +69,12 @@ def replace_placeholders_with_col_values(
         pd.DataFrame: DataFrame with the 'prompt' column updated with placeholders replaced.
     """
 
-    df = dataframe.copy()  # avoid modifying original
+    rendered = pd.Series(index=dataframe.index, dtype=object)
+    # Rows sharing a template (usually all of them) are rendered together
+    for prompt, index in dataframe.groupby(prompt_column_name, sort=False).groups.items():
+        rendered[index] = render_template_prompts(dataframe.loc[index], prompt, placeholder_fields)
 
-    def replace_placeholders(prompt, row):
-        # For each placeholder, replace {{placeholder}} with corresponding row value
-        for placeholder, col_name in placeholder_fields.items():
-            prompt = re.sub(
-                r"\{\{\s*" + re.escape(placeholder) + r"\s*\}\}",
-                str(row[col_name]),
-                prompt,
-            )
-        return prompt
-
-    # Apply row-wise replacement
-    df[prompt_column_name] = df.apply(
-        lambda row: replace_placeholders(row[prompt_column_name], row), axis=1
-    )
+    df = dataframe.assign(**{prompt_column_name: rendered})
 
     # Reset index
     df.reset_index(drop=True, inplace=True)
@@ -116,10 +82,28 @@ def replace_placeholders_with_col_values(
     return df
 
 
-def start_process(dataframe, unique_id_column_name, prompt, placeholder_field):
-    df1 = clean_dataframe(dataframe, unique_id_column_name)
-    df2 = add_prompt_column(df1, prompt)
-    df3 = replace_placeholders_with_col_values(df2, placeholder_field)
+def render_prompts(dataframe, prompt, placeholder_field, prompt_column_name="prompt"):
+    """Add the rendered prompt column to an already cleaned DataFrame (or chunk of it)."""
+    df = dataframe.assign(
+        **{prompt_column_name: render_template_prompts(dataframe, prompt, placeholder_field)}
+    )
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def start_process(
+    dataframe, unique_id_column_name, prompt, placeholder_field, prompt_dedup="off", deduplicator=None
+):
+    # Pass a Deduplicator to read its dropped counts and, with prompt_dedup "fanout", its fanout pairs
+    if deduplicator is None:
+        deduplicator = Deduplicator()
+    df1 = clean_dataframe(dataframe, unique_id_column_name, deduplicator)
+    df3 = render_prompts(df1, prompt, placeholder_field)
+    if prompt_dedup == "drop":
+        deduplicator.drop_duplicate_prompts(df3)
+    elif prompt_dedup == "fanout":
+        deduplicator.fan_out_prompts(df3, unique_id_column_name or "unique_id")
+    logging.info(f"Dropped rows: {deduplicator.dropped}")
 
     return df3
 
@@ -141,6 +125,5 @@ if __name__ == "__main__":
     placeholder_field = {"input_url": "URL"}
 
     df1 = clean_dataframe(dataframe, unique_id_column_name)
-    df2 = add_prompt_column(df1, prompt)
-    df3 = replace_placeholders_with_col_values(df2, placeholder_field)
+    df3 = render_prompts(df1, prompt, placeholder_field)
     df3.to_excel("test output.xlsx", index=False)
@@ -0,0 +1,107 @@
+# Import necessary libraries
+import numpy as np
+import pandas as pd
+
+
+DROP_REASONS = ("missing_id", "zero_id", "duplicate_id", "duplicate_row", "duplicate_prompt", "fanned_out_prompt")
+# FNV-1a 64 bit prime, mixes the per-column hashes of a row
+HASH_PRIME = np.uint64(0x100000001B3)
+
+
+def row_hashes(df, columns):
+    """
+    One 64-bit hash per row over `columns`.
+    Columns are hashed one by one and combined, so no sub-frame of `columns` is copied.
+    """
+    hashes = np.zeros(len(df), dtype="uint64")
+    for col in columns:
+        hashes = hashes * HASH_PRIME ^ pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+    return pd.Series(hashes, index=df.index)
+
+
+class Deduplicator:
+    """
+    Drops invalid and duplicate rows, comparing 64-bit row hashes instead of values.
+
+    Keeps the IDs and hashes it has seen, so the chunks of one file are
+    deduplicated against each other as well. `dropped` counts the dropped rows
+    per reason (see DROP_REASONS), `fanout` holds the (custom_id, unique_id)
+    pairs of the rows whose prompt was fanned out (see fan_out_prompts).
+
+    `duplicate_rows=False` skips the check on the other columns, for frames
+    that hold only some of the file's columns.
+    """
+
+    def __init__(self, duplicate_rows=True):
+        self.duplicate_rows = duplicate_rows
+        self.seen_ids = set()
+        self.seen_rows = set()
+        self.seen_prompts = set()
+        # prompt hash -> ID of the row whose request carries that prompt
+        self.prompt_ids = {}
+        self.fanout = []
+        self.dropped = dict.fromkeys(DROP_REASONS, 0)
+
+    def total_dropped(self):
+        return sum(self.dropped.values())
+
+    def keep_rows(self, df, index):
+        # In place: drop every row not in `index`
+        df.drop(index=df.index.difference(index), inplace=True)
+        df.reset_index(drop=True, inplace=True)
+        return df
+
+    def clean(self, df, unique_id_column_name):
+        """
+        In place, in this order:
+        1. Drop rows whose unique ID is NaN or 0.
+        2. Keep the first row of every unique ID.
+        3. Keep the first row of every combination of values in all other columns (if duplicate_rows).
+        """
+        ids = df[unique_id_column_name]
+        missing = ids.isna()
+        zero = ~missing & (ids == 0)
+        self.dropped["missing_id"] += int(missing.sum())
+        self.dropped["zero_id"] += int(zero.sum())
+        ids = ids[~(missing | zero)]
+
+        duplicate_id = ids.duplicated() | ids.isin(self.seen_ids)
+        self.dropped["duplicate_id"] += int(duplicate_id.sum())
+        ids = ids[~duplicate_id]
+
+        other_columns = df.columns.difference([unique_id_column_name])
+        if self.duplicate_rows and len(other_columns):
+            hashes = row_hashes(df, other_columns)[ids.index]
+            duplicate_row = hashes.duplicated() | hashes.isin(self.seen_rows)
+            self.dropped["duplicate_row"] += int(duplicate_row.sum())
+            ids = ids[~duplicate_row]
+            self.seen_rows.update(hashes[~duplicate_row].tolist())
+
+        self.seen_ids.update(ids.tolist())
+        return self.keep_rows(df, ids.index)
+
+    def drop_duplicate_prompts(self, df, prompt_column_name="prompt"):
+        """In place: keep the first row of every distinct rendered prompt."""
+        hashes = pd.util.hash_pandas_object(df[prompt_column_name], index=False)
+        duplicate_prompt = hashes.duplicated() | hashes.isin(self.seen_prompts)
+        self.dropped["duplicate_prompt"] += int(duplicate_prompt.sum())
+        self.seen_prompts.update(hashes[~duplicate_prompt].tolist())
+        return self.keep_rows(df, hashes.index[~duplicate_prompt.to_numpy()])
+
+    def fan_out_prompts(self, df, unique_id_column_name, prompt_column_name="prompt"):
+        """
+        In place: keep the first row of every distinct rendered prompt, its ID is the custom_id
+        of the one request sent for that prompt. The IDs of the other rows with the same prompt
+        are appended to `fanout`, so the result can be copied to them after the batch.
+        """
+        hashes = pd.util.hash_pandas_object(df[prompt_column_name], index=False)
+        ids = df[unique_id_column_name]
+        first = ~(hashes.duplicated() | hashes.isin(self.prompt_ids.keys()))
+        self.prompt_ids.update(zip(hashes[first].tolist(), ids[first].tolist()))
+
+        fanned_out = ~first
+        self.dropped["fanned_out_prompt"] += int(fanned_out.sum())
+        self.fanout.extend(
+            zip([self.prompt_ids[h] for h in hashes[fanned_out].tolist()], ids[fanned_out].tolist())
+        )
+        return self.keep_rows(df, hashes.index[first.to_numpy()])
@@ -77,10 +77,10 @@ def download_jsonl_of_batch_id(
 
 
 def download_csv_of_batch_output_file(
-    client, file_id: str, save_path: str | Path | None = None
+    client, file_id: str, save_path: str | Path | None = None, fanout: dict | None = None
 ) -> pd.DataFrame:
     output_jsonl_file_bytes = download_jsonl_file(client, file_id)
-    dataframe = output_jsonl_to_dataframe(output_jsonl_file_bytes)
+    dataframe = output_jsonl_to_dataframe(output_jsonl_file_bytes, fanout)
     # Save if a path is provided
     if save_path:
         dataframe.to_excel(save_path, index=False)
@@ -99,7 +99,7 @@ def download_csv_of_batch_input_file(
 
 
 def download_csv_of_batch_id(
-    client, batch_id: str, save_path: str | Path | None = None
+    client, batch_id: str, save_path: str | Path | None = None, fanout: dict | None = None
 ) -> dict:
     """
     Downloads a csv file from OpenAI given a batch_id.
@@ -108,6 +108,7 @@ def download_csv_of_batch_id(
         client: An instance of OpenAI client.
         batch_id: The ID of the batch to download.
         save_path: Optional path to save the file locally.
+        fanout: Optional custom_id -> unique_ids mapping of a fanned out job.
 
     Returns:
         The file status along with jsonl bytes and dataframe.
@@ -117,7 +118,7 @@ def download_csv_of_batch_id(
     response = download_jsonl_of_batch_id(client, batch_id)
     if response["status"] == "completed":
         # Fetch the file content object
-        dataframe = output_jsonl_to_dataframe(response["file_bytes"])
+        dataframe = output_jsonl_to_dataframe(response["file_bytes"], fanout)
         # Save if a path is provided
         if save_path:
             dataframe.to_excel(save_path, index=False)
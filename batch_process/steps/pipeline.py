@@ -0,0 +1,68 @@
+# Import necessary libraries
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+from common import get_azure_client
+from .upload_file import upload_jsonl_file, UPLOAD_CONCURRENCY
+from .start_batch_job import start_and_check_batch
+
+
+def process_chunk(chunk, file_name, client, auto_start):
+    """
+    Upload one prepared JSONL chunk and, in auto-start mode, wait until it is
+    processed and start its batch.
+
+    Returns:
+        dict: "file_id", "status", "chunk_no", "total_rows_processed", "error",
+              and the started batch (or None) under "batch".
+    """
+    result = {
+        "file_id": None,
+        "status": "failed",
+        "chunk_no": chunk["chunk_no"],
+        "total_rows_processed": chunk["rows"],
+        "error": None,
+        "batch": None,
+    }
+    try:
+        result["file_id"], result["status"] = upload_jsonl_file(
+            chunk["file"], file_name, client, wait_processed=auto_start
+        )
+        if auto_start and result["file_id"] is not None:
+            result["batch"] = start_and_check_batch(client, result["file_id"])
+    except Exception as err:
+        # One failed chunk must not abort the others
+        logging.exception(f"Pipeline of {chunk['chunk_no']} failed: {err}")
+        result["error"] = str(err)
+    finally:
+        chunk["file"].close()
+    return result
+
+
+def start_process(chunks, file_name, description_json):
+    """
+    Upload the prepared chunks concurrently (UPLOAD_CONCURRENCY at a time).
+    With config.autoStart every chunk goes upload -> wait until processed -> start batch
+    on its own worker, so the first batch starts as soon as its chunk is ready.
+
+    Returns:
+        list[dict]: Per chunk results in chunk order, see process_chunk.
+    """
+    credentials = description_json["credentials"]
+    client = get_azure_client(credentials["endpoint"], credentials["apiKey"])
+    auto_start = description_json.get("config", {}).get("autoStart", False)
+
+    # The next chunk is taken from `chunks` once a worker is free, so chunks that are
+    # rendered while they are taken (see stream_file.PreparedUpload.jsonl_chunks) start
+    # uploading right away and are not all spooled up front
+    free_workers = threading.Semaphore(UPLOAD_CONCURRENCY)
+    futures = []
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+        for chunk in chunks:
+            free_workers.acquire()
+            future = executor.submit(process_chunk, chunk, file_name, client, auto_start)
+            future.add_done_callback(lambda _: free_workers.release())
+            futures.append(future)
+        return [future.result() for future in futures]
@@ -1,6 +1,7 @@
 # Import necessary libraries
 import os
 import re
+import logging
 import pandas as pd
 import json
 import time
@@ -8,12 +9,17 @@ import threading
 from tqdm import tqdm
 from openai import AzureOpenAI
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 
-from batch_history import get_openai_client, get_chunk_no_and_row_count
+from batch_history import get_openai_client, get_chunk_details_for_file_ids
 from .batch_status import check_batch_progress
 
 
+# Number of batches created/checked at the same time
+BATCH_START_CONCURRENCY = int(os.getenv("BATCH_START_CONCURRENCY", "8"))
+
+
 # def check_batch_status(client, batch_id):
 #     # Monitor the batch status
 #     status = "validating"
@@ -49,32 +55,43 @@ def start_batch(client, file_id, endpoint="/chat/completions", completion_window
     return batch_response.id
 
 
-def start_process(user_id, job_id, list_of_file_ids):
+def start_and_check_batch(client, file_id):
+    """Start the batch of one uploaded file and fetch its first status."""
+    batch_id = start_batch(client, file_id)
+    batch_response = check_batch_progress(client, batch_id)
+    if batch_response["error"] is not None:
+        # The batch was just created, a failed first check does not make its id invalid
+        batch_response["status"] = "validating"
+    batch_response.pop("error")
+    return {"batch_id": batch_id, "file_id": file_id, **batch_response}
+
+
+def start_process(user_id, job_id, list_of_file_ids, uow=None):
     client = get_openai_client(user_id, job_id)
+
+    # Every file goes through create + first status check on its own worker
+    with ThreadPoolExecutor(max_workers=BATCH_START_CONCURRENCY) as executor:
+        futures = {
+            file_id: executor.submit(start_and_check_batch, client, file_id)
+            for file_id in list_of_file_ids
+        }
+
     batch_jobs_data = []
-    for index, file_id in enumerate(list_of_file_ids, start=1):
-        chunk_no, total_rows_processed = get_chunk_no_and_row_count(
-            user_id, job_id, file_id
-        )
-        batch_id = start_batch(client, file_id)
-        batch_jobs_data.append(
-            {
-                "batch_id": batch_id,
-                "file_id": file_id,
-                "output_file_id": None,
-                "status": "validating",
-                "chunk_no": chunk_no,
-                "total_rows_processed": total_rows_processed,
-            }
-        )
-    final_batch_job_data = []
-    for index, batch in enumerate(batch_jobs_data, start=1):
-        batch_response = check_batch_progress(client, batch["batch_id"])
-        batch["status"] = batch_response["status"]
-        batch["output_file_id"] = batch_response["output_file_id"]
-        final_batch_job_data.append(batch)
-
-    return final_batch_job_data
+    for file_id, future in futures.items():
+        try:
+            batch_jobs_data.append(future.result())
+        except Exception as err:
+            # A file that could not be started stays "not_started" and can be retried
+            logging.exception(f"Could not start batch for file {file_id}: {err}")
+
+    started_file_ids = [batch["file_id"] for batch in batch_jobs_data]
+    chunk_details = get_chunk_details_for_file_ids(
+        user_id, job_id, started_file_ids, uow=uow
+    )
+    for batch in batch_jobs_data:
+        batch["chunk_no"], batch["total_rows_processed"] = chunk_details[batch["file_id"]]
+
+    return batch_jobs_data
 
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+# Import necessary libraries
+import os
+import logging
+import tempfile
+import pandas as pd
+
+
+from common.ingest import iter_upload_chunks, read_header, scan_upload, INGEST_CHUNK_ROWS
+from .create_file import clean_dataframe, render_prompts
+from .dedup import Deduplicator
+from .upload_file import write_jsonl
+
+
+# Chunk files larger than this are spooled to disk instead of memory
+CHUNK_SPOOL_SIZE = int(os.getenv("CHUNK_SPOOL_SIZE", str(16 * 1024 * 1024)))
+PREVIEW_ROWS = 20
+
+
+def projected_columns(file, filename, description_json):
+    """
+    The columns the batch needs: the unique ID plus every column mapped to a placeholder.
+
+    Returns:
+        tuple: (usecols, string_columns); usecols is None when every column is loaded, e.g. when
+               the prompt maps no column (then all of them take part in the duplicate-row check).
+    Raises:
+        ValueError: If a required column is not in the file.
+    """
+    placeholder_columns = list(dict.fromkeys((description_json.get("placeholder_field") or {}).values()))
+    if not placeholder_columns:
+        return None, []
+
+    unique_id_field = description_json["unique_id_field"]
+    usecols = ([unique_id_field] if unique_id_field else []) + [
+        col for col in placeholder_columns if col != unique_id_field
+    ]
+    header = read_header(file, filename)
+    missing = [col for col in usecols if col not in header]
+    if missing:
+        raise ValueError(f"Columns not found in {filename}: {', '.join(missing)}")
+
+    # Placeholder values only end up as prompt text
+    string_columns = [col for col in placeholder_columns if col != unique_id_field]
+    if set(header) <= set(usecols):
+        # Every column is needed anyway
+        return None, string_columns
+    return usecols, string_columns
+
+
+class PreparedUpload:
+    """
+    Streams an uploaded file through cleaning, rendering and JSONL serialization,
+    one chunk of rows at a time, so memory is bounded by the chunk size.
+    Only the unique ID and placeholder columns are loaded (see projected_columns).
+
+    Creating it checks the mapped columns and makes one pass over the unique ID and
+    placeholder columns, for their dtypes and the number of rows (see scan_upload).
+    jsonl_chunks then renders the file once, handing out every batch chunk as soon
+    as its rows are written; summary() is complete once all chunks were taken.
+    """
+
+    def __init__(self, file, filename, description_json, chunk_rows=INGEST_CHUNK_ROWS):
+        self.file = file
+        self.filename = filename
+        self.description_json = description_json
+        self.chunk_rows = chunk_rows
+        self.unique_id_field = description_json["unique_id_field"]
+        self.unique_id_column_name = self.unique_id_field if self.unique_id_field else "unique_id"
+
+        self.usecols, self.string_columns = projected_columns(file, filename, description_json)
+        # Chunks are deduplicated against each other too. The columns that were not
+        # loaded can tell rows apart, so a projected frame skips the duplicate-row check
+        self.deduplicator = Deduplicator(duplicate_rows=self.usecols is None)
+        # config.promptDedup: send each distinct rendered prompt once and
+        # "drop" the other rows, or "fanout" its result to them after the batch
+        self.prompt_dedup = description_json.get("config", {}).get("promptDedup", "off")
+
+        # The unique ID becomes the custom_id and the placeholders become prompt text,
+        # their dtypes must not change from chunk to chunk
+        typed_columns = ([self.unique_id_field] if self.unique_id_field else []) + list(self.string_columns)
+        self.dtypes, self.source_rows = scan_upload(file, filename, typed_columns, chunk_rows)
+
+        self.csv = tempfile.TemporaryFile()
+        self.rows_read = 0
+        self.total_rows = 0
+        self.preview = []
+
+    def render(self, chunk):
+        """Clean and render one slice of the file; the kept rows are appended to the CSV."""
+        if not self.unique_id_field:
+            # Same rule as clean_dataframe, with IDs numbered across chunks
+            if self.unique_id_column_name in chunk.columns:
+                raise ValueError(
+                    f"Default ID column '{self.unique_id_column_name}' already exists in the dataframe. Please provide a unique column name."
+                )
+            chunk[self.unique_id_column_name] = range(self.rows_read + 1, self.rows_read + len(chunk) + 1)
+        self.rows_read += len(chunk)
+
+        cleaned = clean_dataframe(chunk, self.unique_id_column_name, self.deduplicator)
+        if cleaned.empty:
+            return cleaned
+
+        rendered = render_prompts(
+            cleaned, self.description_json["prompt"], self.description_json["placeholder_field"]
+        )
+        if self.prompt_dedup == "drop":
+            self.deduplicator.drop_duplicate_prompts(rendered)
+        elif self.prompt_dedup == "fanout":
+            self.deduplicator.fan_out_prompts(rendered, self.unique_id_column_name)
+        if rendered.empty:
+            return rendered
+
+        rendered.to_csv(self.csv, index=False, header=self.total_rows == 0, encoding="utf-8")
+        if self.total_rows < PREVIEW_ROWS:
+            self.preview.append(rendered.head(PREVIEW_ROWS - self.total_rows))
+        self.total_rows += len(rendered)
+        return rendered
+
+    def rendered_slices(self, number_of_chunks):
+        """
+        Yields (chunk index, rendered rows). The rows of the file are split into
+        `number_of_chunks` chunks the way split_dataframe_into_chunks splits a DataFrame,
+        counted on the rows of the file (before rows are dropped), so a chunk is known
+        to be complete as soon as the reading gets past its last row.
+        """
+        rows_per_chunk = self.source_rows // number_of_chunks
+        last = number_of_chunks - 1
+        for chunk in iter_upload_chunks(
+            self.file,
+            self.filename,
+            self.chunk_rows,
+            usecols=self.usecols,
+            string_columns=self.string_columns,
+            dtypes=self.dtypes or None,
+        ):
+            start = 0
+            while start < len(chunk):
+                # Last chunk takes all remaining rows
+                index = min(self.rows_read // rows_per_chunk, last) if rows_per_chunk else last
+                end = len(chunk) if index == last else min(len(chunk), start + (index + 1) * rows_per_chunk - self.rows_read)
+                rows = chunk if start == 0 and end == len(chunk) else chunk.iloc[start:end].copy()
+                start = end
+                rendered = self.render(rows)
+                if not rendered.empty:
+                    yield index, rendered
+
+    def jsonl_chunks(self, number_of_chunks):
+        """
+        Yields:
+            dict: {"chunk_no", "rows", "file"} per chunk, as soon as its last row is rendered.
+                  Chunks without rows are skipped.
+        """
+        credentials = self.description_json["credentials"]
+        current = None
+        current_index = None
+        for index, rendered in self.rendered_slices(number_of_chunks):
+            if current is not None and index != current_index:
+                yield current
+                current = None
+            if current is None:
+                current_index = index
+                current = {
+                    "chunk_no": f"chunk_{index + 1}",
+                    "rows": 0,
+                    "file": tempfile.SpooledTemporaryFile(max_size=CHUNK_SPOOL_SIZE),
+                }
+            write_jsonl(
+                rendered,
+                "prompt",
+                self.unique_id_column_name,
+                credentials["deploymentName"],
+                credentials["temperature"],
+                current["file"],
+            )
+            current["rows"] += len(rendered)
+        if current is not None:
+            yield current
+        logging.info(
+            f"Prepared {self.total_rows} of {self.rows_read} rows from {self.filename}, "
+            f"dropped: {self.deduplicator.dropped}"
+        )
+
+    def summary(self):
+        """
+        Returns:
+            dict:
+                "csv": temporary file with the rendered rows (for the download in the response),
+                "total_rows": number of kept rows,
+                "preview": pd.DataFrame of the first PREVIEW_ROWS rendered rows,
+                "dropped_rows": number of dropped rows per reason (see Deduplicator),
+                "fanout": (custom_id, unique_id) pairs of the fanned out rows.
+        """
+        return {
+            "csv": self.csv,
+            "total_rows": self.total_rows,
+            "preview": pd.concat(self.preview, ignore_index=True) if self.preview else pd.DataFrame(),
+            "dropped_rows": self.deduplicator.dropped,
+            "fanout": self.deduplicator.fanout,
+        }
+
+
+def start_process(file, filename, description_json):
+    """
+    Returns:
+        tuple: (PreparedUpload, its JSONL chunks for config.chunkSize chunks, see PreparedUpload.jsonl_chunks)
+    """
+    upload = PreparedUpload(file, filename, description_json)
+    return upload, upload.jsonl_chunks(description_json["config"]["chunkSize"])
@@ -2,13 +2,31 @@
 import io
 import os
 import re
+import logging
 import pandas as pd
 import json
 import time
+from json.encoder import encode_basestring_ascii
 import threading
 from tqdm import tqdm
 from openai import AzureOpenAI
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+from common import get_azure_client
+
+
+# Number of chunks uploaded at the same time
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "8"))
+# How long to wait for an uploaded file to reach "processed" when asked to
+FILE_PROCESS_TIMEOUT = float(os.getenv("FILE_PROCESS_TIMEOUT", "300"))
+FILE_PROCESS_POLL_INTERVAL = 2.0
+# Rows encoded per write in write_jsonl
+JSONL_WRITE_ROWS = 10000
+# Placeholders of the per row values in request_line_template
+CUSTOM_ID_SLOT = "__custom_id__"
+CONTENT_SLOT = "__content__"
 
 
 # def split_dataframe_into_chunks(dataframe, chunk_size):
@@ -50,6 +68,83 @@ def split_dataframe_into_chunks(dataframe, number_of_chunks):
 
 
 
+def encode_json_value(value):
+    # Same output as json.dumps(value) for one value, C accelerated for strings
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    return json.dumps(value)
+
+
+def request_line_template(model_name, temperature):
+    """
+    The JSONL request line as json.dumps writes it, split around the custom_id and the
+    user message, so only those two values have to be encoded per row.
+    """
+    json_object = {
+        "custom_id": CUSTOM_ID_SLOT,
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {
+            "model": model_name,
+            "temperature": temperature,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": CONTENT_SLOT},
+            ],
+        },
+    }
+    line = json.dumps(json_object) + "\n"
+    head, rest = line.split(json.dumps(CUSTOM_ID_SLOT), 1)
+    middle, tail = rest.split(json.dumps(CONTENT_SLOT), 1)
+    return head, middle, tail
+
+
+def write_jsonl(df, prompt_col_name, unique_id_col_name, model_name, temperature, out):
+    """
+    Write one batch request line per row of `df` to the binary file object `out`.
+    The lines are byte-identical to json.dumps of the request of each row.
+    """
+    head, middle, tail = request_line_template(model_name, temperature)
+    # tolist() gives Python scalars, like the values json.dumps got from iterrows
+    custom_ids = df[unique_id_col_name].tolist()
+    prompts = df[prompt_col_name].astype(object).tolist()
+    for start in range(0, len(custom_ids), JSONL_WRITE_ROWS):
+        end = start + JSONL_WRITE_ROWS
+        lines = "".join(
+            head + encode_json_value(custom_id) + middle + encode_json_value(prompt) + tail
+            for custom_id, prompt in zip(custom_ids[start:end], prompts[start:end])
+        )
+        out.write(lines.encode("utf-8"))
+
+
+def upload_jsonl_file(jsonl_file, file_name, client, wait_processed=False):
+    """
+    Upload an already serialized JSONL file object for batch use.
+
+    Returns:
+        tuple: (file_id, status), file_id is None unless the file is processed.
+    """
+    # Move cursor to the beginning
+    jsonl_file.seek(0)
+
+    # Upload to client, the tuple gives the OpenAI client the filename
+    uploaded_file = client.files.create(file=(f"{file_name}.jsonl", jsonl_file), purpose="batch")
+
+    # Return the file ID
+    file_id = uploaded_file.id
+
+    if wait_processed:
+        status = wait_until_processed(client, file_id)
+    else:
+        file_info = client.files.retrieve(file_id)
+        status = file_info.status.lower()
+
+    if status == "processed":
+        return file_id, status
+    else:
+        return None, status
+
+
 def upload_dataframe_as_jsonl(
     df,
     prompt_col_name,
@@ -58,6 +153,7 @@ def upload_dataframe_as_jsonl(
     client,
     model_name,
     temperature=0.5,
+    wait_processed=False,
 ):
     """
     Converts a DataFrame into JSONL format suitable for batch upload and uploads it to the client.
@@ -69,6 +165,7 @@ def upload_dataframe_as_jsonl(
         client: The client object to upload the file (e.g., OpenAI client).
         model_name (str): Model name for completion.
         temperature (float): Temperature setting for model responses.
+        wait_processed (bool): Wait until the file is processed instead of checking once.
 
     Returns:
         str: Uploaded file ID.
@@ -78,41 +175,26 @@ def upload_dataframe_as_jsonl(
     jsonl_bytes = io.BytesIO()
 
     # Write each row as a JSON object to the buffer
-    for _, row in df.iterrows():
-        json_object = {
-            "custom_id": row[unique_id_col_name],
-            "method": "POST",
-            "url": "/chat/completions",
-            "body": {
-                "model": model_name,
-                "temperature": temperature,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": row[prompt_col_name]},
-                ],
-            },
-        }
-        jsonl_bytes.write((json.dumps(json_object) + "\n").encode("utf-8"))
-
-    # Move buffer cursor to the beginning
-    jsonl_bytes.seek(0)
-
-    # Add a name attribute so OpenAI client knows the filename
-    jsonl_bytes.name = f"{file_name}.jsonl"
+    write_jsonl(df, prompt_col_name, unique_id_col_name, model_name, temperature, jsonl_bytes)
 
-    # Upload to client
-    uploaded_file = client.files.create(file=jsonl_bytes, purpose="batch")
+    return upload_jsonl_file(jsonl_bytes, file_name, client, wait_processed=wait_processed)
 
-    # Return the file ID
-    file_id = uploaded_file.id
 
-    file_info = client.files.retrieve(file_id)
-    status = file_info.status.lower()
+def wait_until_processed(client, file_id, timeout=FILE_PROCESS_TIMEOUT):
+    """
+    Poll an uploaded file until it leaves the "uploaded"/"pending" state or `timeout` expires.
 
-    if status == "processed":
-        return file_id, status
-    else:
-        return None, status
+    Returns:
+        str: The last file status seen (lower case).
+    """
+    deadline = time.monotonic() + timeout
+    interval = FILE_PROCESS_POLL_INTERVAL
+    while True:
+        status = client.files.retrieve(file_id).status.lower()
+        if status not in ("uploaded", "pending", "running") or time.monotonic() >= deadline:
+            return status
+        time.sleep(interval)
+        interval = min(interval * 1.5, 15.0)
 
 
 def start_process(dataframe, file_name, description_json):
@@ -120,35 +202,44 @@ def start_process(dataframe, file_name, description_json):
     unique_id_column_name = description_json["unique_id_field"] if description_json["unique_id_field"] else "unique_id"
     credentials = description_json["credentials"]
     config = description_json["config"]
-    client = AzureOpenAI(
-        api_key=credentials["apiKey"],
-        azure_endpoint=credentials["endpoint"],
-        api_version="2025-01-01-preview",
-    )
+    client = get_azure_client(credentials["endpoint"], credentials["apiKey"])
     model_name = credentials["deploymentName"]
     temperature = credentials["temperature"]
     chunk_size = config["chunkSize"]
 
     dataframe_chunks_list = split_dataframe_into_chunks(dataframe, chunk_size)
-    final_output = []
-    for index, chunk in enumerate(dataframe_chunks_list, start=1):
-        file_id, status = upload_dataframe_as_jsonl(
-            chunk,
-            prompt_column_name,
-            unique_id_column_name,
-            file_name,
-            client,
-            model_name,
-            temperature,
-        )
-        final_output.append(
-            {
-                "file_id": file_id,
-                "status": status,
-                "chunk_no": f"chunk_{index}",
-                "total_rows_processed": len(chunk),
-            }
-        )
+
+    def upload_chunk(index, chunk):
+        try:
+            file_id, status = upload_dataframe_as_jsonl(
+                chunk,
+                prompt_column_name,
+                unique_id_column_name,
+                file_name,
+                client,
+                model_name,
+                temperature,
+            )
+            error = None
+        except Exception as err:
+            # One failed chunk must not abort the others
+            logging.exception(f"Upload of chunk_{index} failed: {err}")
+            file_id, status, error = None, "failed", str(err)
+        return {
+            "file_id": file_id,
+            "status": status,
+            "chunk_no": f"chunk_{index}",
+            "total_rows_processed": len(chunk),
+            "error": error,
+        }
+
+    # Upload chunks concurrently, results stay in chunk_no order
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+        futures = [
+            executor.submit(upload_chunk, index, chunk)
+            for index, chunk in enumerate(dataframe_chunks_list, start=1)
+        ]
+        final_output = [future.result() for future in futures]
 
     return final_output
 
@@ -39,14 +39,46 @@ def handling_gpt_output(gpt_response: str) -> dict:
     return {}
 
 
-def output_jsonl_to_dataframe(jsonl_bytes: bytes) -> pd.DataFrame:
+def restore_id_type(unique_id: str, custom_id):
+    # IDs are stored as text, give them back the (numeric) type of the custom_id when they fit it
+    if isinstance(custom_id, (int, float)) and not isinstance(custom_id, bool):
+        for cast in (type(custom_id), float):
+            try:
+                return cast(unique_id)
+            except ValueError:
+                continue
+    return unique_id
+
+
+def fan_out_records(records: list, fanout: dict) -> list:
+    """
+    Copy the result of every custom_id in `fanout` to the unique_ids that shared its prompt.
+    The copies carry no token usage, only one request was sent.
+    """
+    fanned_out = []
+    for record in records:
+        custom_id = record["unique_id"]
+        for unique_id in fanout.get(str(custom_id), []):
+            fanned_out.append(
+                {
+                    **record,
+                    "unique_id": restore_id_type(unique_id, custom_id),
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "total_tokens": 0,
+                }
+            )
+    return records + fanned_out
+
+
+def output_jsonl_to_dataframe(jsonl_bytes: bytes, fanout: dict | None = None) -> pd.DataFrame:
     """
     Convert a .jsonl byte stream (with GPT responses) into a structured pandas DataFrame.
 
     Args:
         jsonl_bytes (bytes): Byte content of a .jsonl file.
-        parse_gpt_output (callable): Function that takes the GPT 'content' string and
-                                     returns a valid Python dict.
+        fanout (dict): custom_id -> unique_ids sharing its prompt (config.promptDedup "fanout"),
+                       each of them gets a row with the result of the custom_id.
 
     Returns:
         pd.DataFrame: Structured dataframe with expanded GPT content fields.
@@ -89,6 +121,9 @@ def output_jsonl_to_dataframe(jsonl_bytes: bytes) -> pd.DataFrame:
             # skip malformed line gracefully
             continue
 
+    if fanout:
+        records = fan_out_records(records, fanout)
+
     # Create DataFrame
     df = pd.DataFrame(records)
 
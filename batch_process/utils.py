@@ -12,11 +12,15 @@ import time
 from tqdm import tqdm
 from dotenv import load_dotenv
 from openai import AzureOpenAI
+from fastapi.encoders import jsonable_encoder
 
 
 # Load environment variables
 load_dotenv()
 
+# Bytes of a file base64 encoded at a time by stream_json_with_file (multiple of 3)
+FILE_ENCODE_BLOCK_SIZE = 3 * 1024 * 1024
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -79,6 +83,45 @@ def convert_df_to_bytes(
     return summary
 
 
+def convert_csv_file_to_bytes(
+    csv_file,
+    total_rows: int,
+    preview_df: pd.DataFrame,
+) -> dict:
+    """
+    convert_df_to_bytes for output that was already written to a CSV file object.
+    "file_data" is the file itself; send the summary with stream_json_with_file,
+    which base64 encodes it block by block.
+    """
+    summary = {
+        "total_test_rows_processed": total_rows,
+        "row_preview_data": preview_df.fillna("N/A").to_dict(orient="records"),
+        "file_data": csv_file,
+    }
+    return summary
+
+
+def stream_json_with_file(summary, file_key="file_data"):
+    """
+    Yield the JSON of `summary` piece by piece, with the file object under `file_key`
+    as its base64 text. Only one block of the file is in memory at a time,
+    however large the file is. Closes the file.
+    """
+    data_file = summary[file_key]
+    try:
+        fields = jsonable_encoder({key: value for key, value in summary.items() if key != file_key})
+        # Same encoding as FastAPI's JSONResponse
+        head = json.dumps(fields, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+        yield (head[:-1] + ("," if fields else "") + json.dumps(file_key) + ':"').encode("utf-8")
+        data_file.seek(0)
+        # Blocks of a multiple of 3 bytes encode without padding, so their base64 texts join up
+        while block := data_file.read(FILE_ENCODE_BLOCK_SIZE):
+            yield base64.b64encode(block)
+        yield b'"}'
+    finally:
+        data_file.close()
+
+
 # -------------------------
 # Example Run
 # -------------------------
@@ -0,0 +1,16 @@
+from .openai_clients import (
+    get_azure_client,
+    get_async_azure_client,
+    client_registry,
+    async_client_registry,
+)
+from .prompt_template import compile_template, render_prompts
+
+__all__ = [
+    "get_azure_client",
+    "get_async_azure_client",
+    "client_registry",
+    "async_client_registry",
+    "compile_template",
+    "render_prompts",
+]
@@ -0,0 +1,217 @@
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from common.prompt_template import column_as_str
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+
+# Rows parsed per chunk when streaming an uploaded file
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+CSV_EXTENSIONS = (".csv",)
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+
+class UnsupportedFileType(ValueError):
+    pass
+
+
+def file_kind(filename):
+    name = (filename or "").lower()
+    if name.endswith(CSV_EXTENSIONS):
+        return "csv"
+    if name.endswith(EXCEL_EXTENSIONS):
+        return "excel"
+    raise UnsupportedFileType(f"Unsupported file type: {filename}")
+
+
+def is_xlsx(file):
+    # .xlsx is a zip archive, the legacy binary .xls format is not
+    file.seek(0)
+    signature = file.read(4)
+    file.seek(0)
+    return signature == b"PK\x03\x04"
+
+
+def read_legacy_excel(file, **kwargs):
+    # openpyxl only reads .xlsx, the binary .xls format goes through pd.read_excel (needs xlrd)
+    try:
+        return pd.read_excel(file, **kwargs)
+    except ImportError as err:
+        raise UnsupportedFileType(f"Reading .xls files needs the xlrd package: {err}") from err
+
+
+def header_columns(header):
+    return [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+
+
+def read_header(file, filename):
+    """Column names of an uploaded CSV/XLSX file, without reading its rows."""
+    kind = file_kind(filename)
+    file.seek(0)
+    if kind == "csv":
+        columns = list(pd.read_csv(file, nrows=0).columns)
+    elif not is_xlsx(file):
+        columns = list(read_legacy_excel(file, nrows=0).columns)
+    else:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            header = next(workbook.worksheets[0].iter_rows(values_only=True), None)
+        finally:
+            workbook.close()
+        columns = header_columns(header) if header is not None else []
+    file.seek(0)
+    return columns
+
+
+def as_string_columns(df, string_columns):
+    # Parsed values first, then their str() text: "1.50" stays 1.5 like in a fully read file
+    for col in string_columns:
+        df[col] = column_as_str(df[col]).astype(STRING_DTYPE)
+    return df
+
+
+def iter_csv_chunks(file, chunk_rows, nrows=None, usecols=None, string_columns=(), dtypes=None):
+    with pd.read_csv(file, chunksize=chunk_rows, nrows=nrows, usecols=usecols, dtype=dtypes or None) as reader:
+        for chunk in reader:
+            yield as_string_columns(chunk, string_columns)
+
+
+def iter_excel_chunks(file, chunk_rows, nrows=None, usecols=None, string_columns=(), dtypes=None):
+    # read_only streams the rows of the sheet instead of loading the whole workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = header_columns(header)
+        positions = list(range(len(columns)))
+        if usecols is not None:
+            positions = [i for i, col in enumerate(columns) if col in usecols]
+            columns = [columns[i] for i in positions]
+
+        def to_frame(batch):
+            df = pd.DataFrame([[row[i] if i < len(row) else None for i in positions] for row in batch], columns=columns)
+            return as_string_columns(df.astype(dtypes) if dtypes else df, string_columns)
+
+        batch = []
+        total = 0
+        # Empty rows are held back until a row with values follows: pd.read_excel keeps
+        # empty rows between data rows (as all-NaN rows) and drops the trailing ones
+        blank_rows = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            pending = [()] * blank_rows + [row]
+            blank_rows = 0
+            if nrows is not None:
+                pending = pending[: nrows - total]
+            for pending_row in pending:
+                batch.append(pending_row)
+                total += 1
+                if len(batch) >= chunk_rows:
+                    yield to_frame(batch)
+                    batch = []
+            if nrows is not None and total >= nrows:
+                break
+        if batch:
+            yield to_frame(batch)
+    finally:
+        workbook.close()
+
+
+def iter_legacy_excel_chunks(file, chunk_rows, nrows=None, usecols=None, string_columns=()):
+    # The whole sheet is parsed at once, so pandas infers the dtypes of the whole file itself
+    df = read_legacy_excel(file, nrows=nrows, usecols=usecols)
+    for start in range(0, len(df), chunk_rows):
+        yield as_string_columns(df.iloc[start : start + chunk_rows].copy(), string_columns)
+
+
+def iter_upload_chunks(
+    file, filename, chunk_rows=INGEST_CHUNK_ROWS, nrows=None, usecols=None, string_columns=(), dtypes=None
+):
+    """
+    Read an uploaded CSV/XLSX file `chunk_rows` rows at a time.
+
+    Parameters:
+        file: Binary file object, e.g. UploadFile.file (FastAPI already spools large uploads to disk).
+        filename (str): Original file name, its extension selects the parser.
+        nrows (int): Stop after this many data rows.
+        usecols (list): Only load these columns.
+        string_columns (list): Columns turned into text with the compact string dtype.
+        dtypes (dict): Column -> dtype to parse with, e.g. from scan_upload.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of the file.
+    """
+    kind = file_kind(filename)
+    file.seek(0)
+    if kind == "csv":
+        yield from iter_csv_chunks(file, chunk_rows, nrows, usecols, string_columns, dtypes)
+    elif not is_xlsx(file):
+        yield from iter_legacy_excel_chunks(file, chunk_rows, nrows, usecols, string_columns)
+    else:
+        yield from iter_excel_chunks(file, chunk_rows, nrows, usecols, string_columns, dtypes)
+
+
+def scan_upload(file, filename, columns, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    One pass over `columns` only: the dtypes pandas infers for them when it reads the
+    whole file at once, and the number of data rows.
+
+    Every chunk infers its own dtypes: an integer column with a missing value in one
+    chunk is float64 there and int64 in the others. Passing the dtypes of the whole file
+    to iter_upload_chunks keeps the values alike across chunks.
+
+    Returns:
+        tuple: ({column: dtype}, number of rows)
+    """
+    value_dtypes = {col: set() for col in columns}
+    has_missing = dict.fromkeys(columns, False)
+    # Without columns of interest the rows are counted on the first column
+    usecols = list(columns) or read_header(file, filename)[:1]
+    rows = 0
+    if usecols:
+        for chunk in iter_upload_chunks(file, filename, chunk_rows, usecols=usecols):
+            rows += len(chunk)
+            for col in columns:
+                values = chunk[col]
+                missing = values.isna()
+                has_missing[col] = has_missing[col] or bool(missing.any())
+                if not missing.all():
+                    value_dtypes[col].add(values[~missing].infer_objects().dtype)
+    file.seek(0)
+    return {col: combined_dtype(value_dtypes[col], has_missing[col]) for col in columns}, rows
+
+
+def combined_dtype(value_dtypes, has_missing):
+    if not value_dtypes:
+        return np.dtype("float64")
+    if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in value_dtypes):
+        dtype = np.result_type(*value_dtypes)
+        # Missing values turn an integer column into float64
+        return np.dtype("float64") if has_missing and dtype.kind in "iu" else dtype
+    if len(value_dtypes) == 1:
+        dtype = next(iter(value_dtypes))
+        # Datetimes hold missing values as NaT
+        if not has_missing or dtype.kind == "M":
+            return dtype
+    return np.dtype("object")
+
+
+def read_upload(file, filename, nrows=None):
+    """Read an uploaded CSV/XLSX file (or its first `nrows` rows) into one DataFrame."""
+    chunks = list(iter_upload_chunks(file, filename, nrows=nrows))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
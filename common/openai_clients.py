@@ -0,0 +1,75 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from openai import AzureOpenAI, AsyncAzureOpenAI
+
+
+DEFAULT_API_VERSION = "2025-01-01-preview"
+OPENAI_CLIENT_CACHE_SIZE = int(os.getenv("OPENAI_CLIENT_CACHE_SIZE", "32"))
+
+
+class ClientRegistry:
+    """
+    Process-wide cache of OpenAI clients keyed by (endpoint, api_key hash, api_version).
+
+    Each client owns an httpx connection pool, so reusing it keeps TLS connections
+    alive across requests and rows instead of handshaking for every call.
+    The least recently used client is evicted once `maxsize` clients exist; evicted
+    clients are not closed explicitly because another thread may still be using them,
+    their connections are released when they are garbage collected.
+    """
+
+    def __init__(self, factory, maxsize=OPENAI_CLIENT_CACHE_SIZE, **client_options):
+        self.factory = factory
+        self.maxsize = maxsize
+        # Passed to every client the factory creates, e.g. max_retries
+        self.client_options = client_options
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(endpoint, api_key, api_version):
+        # Never keep raw API keys as dictionary keys
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+        return (endpoint, key_hash, api_version)
+
+    def get(self, endpoint, api_key, api_version=DEFAULT_API_VERSION):
+        key = self.make_key(endpoint, api_key, api_version)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+            client = self.factory(
+                api_key=api_key,
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                **self.client_options,
+            )
+            self._clients[key] = client
+            while len(self._clients) > self.maxsize:
+                self._clients.popitem(last=False)
+            return client
+
+    def __len__(self):
+        return len(self._clients)
+
+
+client_registry = ClientRegistry(AzureOpenAI)
+# Async clients keep their connections on the event loop they were first used on,
+# which is the single FastAPI/uvicorn loop of the worker process.
+# They are called through rate_limiter.create_chat_completion, which retries itself;
+# the SDK's own retries would multiply the attempts and bypass the limiter.
+async_client_registry = ClientRegistry(AsyncAzureOpenAI, max_retries=0)
+
+
+def get_azure_client(endpoint, api_key, api_version=DEFAULT_API_VERSION):
+    """Return a shared AzureOpenAI client for the given credentials."""
+    return client_registry.get(endpoint, api_key, api_version)
+
+
+def get_async_azure_client(endpoint, api_key, api_version=DEFAULT_API_VERSION):
+    """Return a shared AsyncAzureOpenAI client for the given credentials."""
+    return async_client_registry.get(endpoint, api_key, api_version)
@@ -0,0 +1,110 @@
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+
+PROMPT_TEMPLATE_CACHE_SIZE = int(os.getenv("PROMPT_TEMPLATE_CACHE_SIZE", "128"))
+# {{placeholder}}, whitespace inside the braces is ignored
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(.*?)\s*\}\}")
+
+
+def missing_value(placeholder):
+    return f"<MISSING_{placeholder}>"
+
+
+def format_value(value):
+    # The text of one cell in a prompt, shared by render and render_frame
+    return str(value)
+
+
+class PromptTemplate:
+    """
+    A prompt parsed once into literal text and placeholder slots.
+
+    Rendering puts the value of the mapped column in every slot. A slot whose placeholder
+    is not mapped, whose column does not exist, or whose value is missing (None/NaN)
+    is rendered as "<MISSING_placeholder>". Test and batch jobs render through this class
+    so the same prompt produces the same text in both.
+    """
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        # literals[i] comes before placeholders[i]; literals has one extra trailing item
+        self.literals = []
+        self.placeholders = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(prompt):
+            self.literals.append(prompt[position : match.start()])
+            self.placeholders.append(match.group(1))
+            position = match.end()
+        self.literals.append(prompt[position:])
+
+    def render(self, values):
+        """Render with `values` = {placeholder: value}; missing placeholders get the <MISSING_> marker."""
+        parts = [self.literals[0]]
+        for placeholder, literal in zip(self.placeholders, self.literals[1:]):
+            value = values.get(placeholder)
+            parts.append(missing_value(placeholder) if value is None or pd.isna(value) else format_value(value))
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_row(self, row, placeholder_fields):
+        """Render for one row (dict or pd.Series) given {placeholder: column name}."""
+        return self.render(
+            {
+                placeholder: row[placeholder_fields[placeholder]]
+                for placeholder in self.placeholders
+                if placeholder_fields.get(placeholder) in row
+            }
+        )
+
+    def render_frame(self, dataframe, placeholder_fields):
+        """
+        Render for every row of `dataframe` by concatenating whole columns,
+        without a per-row Python loop.
+
+        Returns:
+            pd.Series: The rendered prompts, aligned with `dataframe`.
+        """
+        rendered = pd.Series(self.literals[0], index=dataframe.index, dtype=object)
+        column_text = {}
+        for placeholder, literal in zip(self.placeholders, self.literals[1:]):
+            col_name = placeholder_fields.get(placeholder)
+            if col_name in dataframe.columns:
+                if col_name not in column_text:
+                    column_text[col_name] = column_as_str(dataframe[col_name])
+                missing = column_text[col_name].isna()
+                text = column_text[col_name].where(~missing, missing_value(placeholder)) if missing.any() else column_text[col_name]
+                rendered = rendered + text
+            else:
+                rendered = rendered + missing_value(placeholder)
+            rendered = rendered + literal
+        return rendered
+
+
+def column_as_str(column):
+    # format_value per cell, missing cells stay missing (pandas 3 astype(str) keeps NaN, older versions do not)
+    missing = column.isna()
+    if pd.api.types.is_object_dtype(column.dtype) or pd.api.types.is_string_dtype(column.dtype):
+        # Already str(value) per cell
+        values = column.astype(str).astype(object)
+    else:
+        # astype(str) formats some dtypes differently than str(value), e.g. datetime64
+        # gives "2024-01-01" where a Timestamp gives "2024-01-01 00:00:00"
+        values = column.map(format_value, na_action="ignore").astype(object)
+    if missing.any():
+        values[missing] = None
+    return values
+
+
+@lru_cache(maxsize=PROMPT_TEMPLATE_CACHE_SIZE)
+def compile_template(prompt):
+    """Parsed PromptTemplate of `prompt`, cached by prompt text."""
+    return PromptTemplate(prompt)
+
+
+def render_prompts(dataframe, prompt, placeholder_fields):
+    """Render `prompt` for every row of `dataframe`, see PromptTemplate.render_frame."""
+    return compile_template(prompt).render_frame(dataframe, placeholder_fields)
@@ -0,0 +1,162 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+
+
+# Default quota per deployment, override through the environment or per job credentials ("rpm"/"tpm")
+AZURE_OPENAI_RPM = int(os.getenv("AZURE_OPENAI_RPM", "300"))
+AZURE_OPENAI_TPM = int(os.getenv("AZURE_OPENAI_TPM", "50000"))
+# Tokens reserved for the completion when estimating the cost of a request
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("COMPLETION_TOKEN_ESTIMATE", "256"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text, good enough for budgeting
+    return len(text or "") // 4 + 1
+
+
+class TokenBucket:
+    def __init__(self, capacity):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60.0  # refill per second
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        # A request larger than the whole bucket is allowed once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Requests/minute and tokens/minute limiter for one deployment.
+
+    Callers reserve one request plus the estimated tokens before each call.
+    The buckets are corrected from the `x-ratelimit-remaining-*` response
+    headers, and `retry-after-ms`/`retry-after` pause every caller of the
+    deployment instead of just the one that got the 429.
+    """
+
+    def __init__(self, rpm=AZURE_OPENAI_RPM, tpm=AZURE_OPENAI_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens):
+        """Reserve capacity; returns 0 on success or the seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return self.blocked_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                return wait
+            self.requests.tokens -= 1
+            self.tokens.tokens -= min(tokens, self.tokens.capacity)
+            return 0.0
+
+    def acquire(self, tokens):
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens):
+        while (wait := self.try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated, actual):
+        """Charge the difference between the estimated and the reported token usage."""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.tokens -= actual - estimated
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        with self._lock:
+            now = time.monotonic()
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests is not None:
+                self.requests.refill(now)
+                self.requests.tokens = min(self.requests.tokens, float(remaining_requests))
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None:
+                self.tokens.refill(now)
+                self.tokens.tokens = min(self.tokens.tokens, float(remaining_tokens))
+
+            retry_after = None
+            if headers.get("retry-after-ms") is not None:
+                retry_after = float(headers["retry-after-ms"]) / 1000.0
+            elif headers.get("retry-after") is not None:
+                try:
+                    retry_after = float(headers["retry-after"])
+                except ValueError:
+                    retry_after = None
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+limiters = {}
+limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(endpoint, deployment, rpm=None, tpm=None):
+    """
+    Return the shared limiter of an (endpoint, deployment) pair and its limits.
+    Callers with other rpm/tpm overrides for the same deployment get a limiter of their own,
+    instead of the limits of whoever asked first.
+    """
+    rpm = int(rpm or AZURE_OPENAI_RPM)
+    tpm = int(tpm or AZURE_OPENAI_TPM)
+    key = (endpoint, deployment, rpm, tpm)
+    with limiters_lock:
+        if key not in limiters:
+            limiters[key] = RateLimiter(rpm, tpm)
+        return limiters[key]
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def create_chat_completion(client, limiter, retries=5, **kwargs):
+    """
+    Call client.chat.completions.create through `limiter`.
+    Retries failed calls with exponential backoff, honoring Retry-After headers.
+    """
+    prompt_text = "".join(str(message.get("content", "")) for message in kwargs.get("messages", []))
+    estimated = estimate_tokens(prompt_text) + kwargs.get("max_tokens", COMPLETION_TOKEN_ESTIMATE)
+
+    for attempt in range(retries):
+        await limiter.acquire_async(estimated)
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(**kwargs)
+            response = raw_response.parse()
+            usage = getattr(response, "usage", None)
+            limiter.record_usage(estimated, getattr(usage, "total_tokens", None))
+            # The service's own remaining quota wins over our bookkeeping
+            limiter.update_from_headers(raw_response.headers)
+            return response
+        except Exception as err:
+            http_response = getattr(err, "response", None)
+            limiter.update_from_headers(getattr(http_response, "headers", None))
+            logging.warning(f"Retry {attempt + 1}/{retries} failed: {err}")
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
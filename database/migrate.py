@@ -0,0 +1,52 @@
+import logging
+from pathlib import Path
+
+import pymysql
+
+from database.mysql_connection import ConnectDB
+
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# MySQL error codes that mean "this migration step was already applied"
+ALREADY_APPLIED_ERRORS = {
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1050,  # table already exists
+}
+
+
+def split_statements(sql):
+    statements = []
+    for statement in sql.split(";"):
+        lines = [line for line in statement.splitlines() if not line.strip().startswith("--")]
+        statement = "\n".join(lines).strip()
+        if statement:
+            statements.append(statement)
+    return statements
+
+
+def run_migrations(migrations_dir=MIGRATIONS_DIR):
+    """
+    Apply every .sql file in `migrations_dir` in filename order.
+    Steps that were already applied (existing index/column/table) are skipped,
+    so running this repeatedly is safe.
+    """
+    db = ConnectDB()
+    try:
+        for path in sorted(Path(migrations_dir).glob("*.sql")):
+            for statement in split_statements(path.read_text()):
+                try:
+                    db.cursor.execute(statement)
+                    logging.info(f"{path.name}: applied `{statement.splitlines()[0]}`")
+                except pymysql.err.MySQLError as err:
+                    if err.args and err.args[0] in ALREADY_APPLIED_ERRORS:
+                        logging.info(f"{path.name}: already applied `{statement.splitlines()[0]}`")
+                    else:
+                        raise
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    run_migrations()
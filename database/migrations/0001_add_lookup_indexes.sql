@@ -0,0 +1,12 @@
+-- Composite indexes backing the point lookups in database/repository.py.
+-- Every history/lookup query filters on (user_id, job_id) and "deleted_at IS NULL",
+-- status checks additionally look rows up by batch_id.
+
+CREATE INDEX idx_uploaded_files_user_job ON uploaded_files_AI_Portal (user_id, job_id, deleted_at);
+
+CREATE INDEX idx_batch_files_user_job ON batch_files_AI_Portal (user_id, job_id, deleted_at);
+
+CREATE INDEX idx_batch_files_batch_id ON batch_files_AI_Portal (batch_id);
+
+-- batch jobs are keyed by `id`, listing is per user
+CREATE INDEX idx_batch_jobs_user ON batch_jobs_AI_Portal (user_id, deleted_at);
@@ -0,0 +1,13 @@
+-- Batch lifecycle details kept on batch_files_AI_Portal (see batch_history/lifecycle.py).
+-- request_counts holds the JSON {"total", "completed", "failed"} reported by Azure.
+
+ALTER TABLE batch_files_AI_Portal ADD COLUMN request_counts TEXT NULL;
+
+ALTER TABLE batch_files_AI_Portal ADD COLUMN error_file_id VARCHAR(255) NULL;
+
+ALTER TABLE batch_files_AI_Portal ADD COLUMN in_progress_at DATETIME NULL;
+
+ALTER TABLE batch_files_AI_Portal ADD COLUMN completed_at DATETIME NULL;
+
+-- The poller looks up pending batches by status
+CREATE INDEX idx_batch_files_status ON batch_files_AI_Portal (status, deleted_at);
@@ -0,0 +1,12 @@
+-- Rows whose rendered prompt was already sent under another ID (config.promptDedup = "fanout").
+-- custom_id is the ID of the request that was sent, unique_id the row that gets a copy of its result.
+
+CREATE TABLE prompt_fanout_AI_Portal (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id VARCHAR(255) NOT NULL,
+    job_id VARCHAR(255) NOT NULL,
+    custom_id VARCHAR(255) NOT NULL,
+    unique_id VARCHAR(255) NOT NULL,
+    created_at DATETIME NULL,
+    INDEX idx_prompt_fanout_user_job (user_id, job_id)
+);
@@ -0,0 +1,14 @@
+-- Revoked signed access tokens (AUTH_TOKEN_MODE = "signed"), shared by every worker.
+-- A row either revokes one token by its jti (logout) or every token of user_id
+-- issued before issued_before (new login, deactivation). Times are epoch seconds;
+-- rows can be deleted once expires_at has passed, the tokens they match have expired by then.
+
+CREATE TABLE revoked_tokens_AI_Portal (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    jti VARCHAR(64) NULL,
+    user_id VARCHAR(255) NULL,
+    issued_before DOUBLE NULL,
+    expires_at DOUBLE NOT NULL,
+    created_at DATETIME NULL,
+    INDEX idx_revoked_tokens_expires_at (expires_at)
+);
@@ -0,0 +1,5 @@
+-- Signed access tokens (AUTH_TOKEN_MODE = "signed") are about 250 characters:
+-- base64 claims (user_id, role, iat, exp, jti) plus a base64 HMAC-SHA256 signature.
+-- Widen the column that stores the current token so they are never truncated.
+
+ALTER TABLE users_AI_Portal MODIFY COLUMN access_token VARCHAR(512) NULL;
@@ -1,5 +1,9 @@
 import os
+import time
+import queue
 import logging
+import weakref
+import threading
 import pymysql
 import pandas as pd
 from dotenv import load_dotenv
@@ -13,30 +17,157 @@ else:
     logging.basicConfig(level=logging.INFO)
 
 
-class ConnectDB:
-    def __init__(self, autocommit=True):
+# Connection pool settings, overridable through the environment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "3600"))
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+# Maximum rows sent per executemany / bulk statement
+DB_BULK_CHUNK_SIZE = int(os.getenv("DB_BULK_CHUNK_SIZE", "500"))
+
+
+def create_connection():
+    return pymysql.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USERNAME"),
+        password=os.getenv("DB_PASSWORD"),
+        db=os.getenv("DB_DATABASE"),
+        charset=os.getenv("DB_CHARSET", "utf8"),
+        port=int(os.getenv("DB_PORT"))
+    )
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PyMySQL connections.
+
+    - At most `size` connections are checked out at the same time, callers
+      block up to `timeout` seconds waiting for a free one.
+    - Connections older than `recycle` seconds are closed and replaced.
+    - Connections idle for more than `ping_after` seconds are pinged
+      (with reconnect) before being handed out again.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, ping_after=DB_POOL_PING_AFTER):
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        # Keyed by the connection itself, entries of connections that are gone disappear with them
+        self._created_at = weakref.WeakKeyDictionary()
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free DB connection within {self.timeout}s (pool size {self.size})")
         try:
-            print("Connecting to DB using PyMySQL...")
+            return self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                conn = create_connection()
+                self._created_at[conn] = time.monotonic()
+                logging.info("Database connection established")
+                return conn
+
+            now = time.monotonic()
+            if now - self._created_at.get(conn, now) > self.recycle:
+                self._discard(conn)
+                continue
+            if now - last_used > self.ping_after:
+                try:
+                    conn.ping(reconnect=True)
+                except Exception as err:
+                    logging.warning(f"Dropping stale DB connection: {err}")
+                    self._discard(conn)
+                    continue
+            return conn
+
+    def release(self, conn):
+        try:
+            if conn.open:
+                conn.rollback()
+                conn.autocommit(True)
+                self._idle.put((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        except Exception as err:
+            logging.warning(f"Discarding DB connection on release: {err}")
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        self._created_at.pop(conn, None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
 
-            self.conn = pymysql.connect(
-                host=os.getenv("DB_HOST"),
-                user=os.getenv("DB_USERNAME"),
-                password=os.getenv("DB_PASSWORD"),
-                db=os.getenv("DB_DATABASE"),
-                charset=os.getenv("DB_CHARSET", "utf8"),
-                port=int(os.getenv("DB_PORT"))
-            )
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
 
 
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use (and again after a fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool()
+                _pool_pid = os.getpid()
+    return _pool
+
+
+class ConnectDB:
+    """
+    A pooled connection. Use it as a context manager (or call close_connection())
+    to hand the connection back; if neither happens, it is released when the
+    object is garbage collected instead of holding a pool slot forever.
+    """
+
+    def __init__(self, autocommit=True):
+        self.conn = None
+        self.cursor = None
+        self._release = None
+        try:
+            self.conn = get_pool().acquire()
+            self._release = weakref.finalize(self, get_pool().release, self.conn)
+            self._release.atexit = False
             self.conn.autocommit(autocommit)
             self.cursor = self.conn.cursor()
 
-            print("✅ DB Connection Successful (PyMySQL)")
-            logging.info("Database connection established")
-
         except Exception as err:
             print("❌ DB Connection Failed:", err)
             logging.error(f"DB connection failed: {err}")
+            if self._release is not None:
+                self._release()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close_connection()
+        return False
 
     # ---------------------------------------------
     # FETCH + PRINT SHAPE + RETURN DATAFRAME
@@ -61,7 +192,7 @@ class ConnectDB:
         finally:
             return response
         
-    def fetch(self, query):
+    def fetch(self, query, params=None):
         try:
             response = {
                         "status_code": 500,
@@ -69,7 +200,7 @@ class ConnectDB:
                         "data": None,
                         "message": None
                         }
-            self.cursor.execute(query)
+            self.cursor.execute(query, params)
             # for query in query_dict:
             #     self.cursor.execute(query["query"], query["data"])
             rows = self.cursor.fetchall()
@@ -89,6 +220,38 @@ class ConnectDB:
         finally:
             return response
         
+    def run_in_transaction(self, statements, autocommit: bool = False):
+        """
+        Execute a list of (query, rows) pairs inside one transaction.
+        Each query is sent with executemany in slices of DB_BULK_CHUNK_SIZE rows.
+        With autocommit=True every slice is committed on its own instead.
+        """
+        self.conn.autocommit(autocommit)
+        if not autocommit:
+            self.conn.begin()
+        try:
+            for query, rows in statements:
+                for start in range(0, len(rows), DB_BULK_CHUNK_SIZE):
+                    self.cursor.executemany(query, rows[start:start + DB_BULK_CHUNK_SIZE])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit(True)
+
+    @staticmethod
+    def group_by_query(query_dict):
+        # Consecutive statements with identical SQL are sent together with executemany.
+        # Only consecutive ones: A, B, A stays in that order, statements may touch the same rows
+        grouped = []
+        for query in query_dict:
+            if grouped and grouped[-1][0] == query["query"]:
+                grouped[-1][1].append(query["data"])
+            else:
+                grouped.append((query["query"], [query["data"]]))
+        return grouped
+
     def insert(self, query_dict, autocommit: bool = False):
         try:
             response = {
@@ -96,10 +259,7 @@ class ConnectDB:
                         "status": "failed",
                         "message": None
                         }
-            self.conn.autocommit = autocommit
-            for query in query_dict:
-                self.cursor.execute(query["query"], query["data"])
-            self.conn.commit()
+            self.run_in_transaction(self.group_by_query(query_dict), autocommit)
             response = {
                         "status_code": 200,
                         "status": "success",
@@ -107,10 +267,8 @@ class ConnectDB:
                         }
             logging.info(f"Entry inserted successfully")
         except Exception as err:
-            self.conn.rollback()
             logging.exception(f"Something went wrong in inserting entry - ConnectDB.insert(): {err}")
         finally:
-            self.conn.autocommit = True
             return response
 
     def update(self, query_dict, autocommit: bool = False):
@@ -120,10 +278,7 @@ class ConnectDB:
                         "status": "failed",
                         "message": None
                         }
-            self.conn.autocommit = autocommit
-            for query in query_dict:
-                self.cursor.execute(query["query"], query["data"])
-            self.conn.commit()
+            self.run_in_transaction(self.group_by_query(query_dict), autocommit)
             response = {
                         "status_code": 200,
                         "status": "success",
@@ -133,12 +288,119 @@ class ConnectDB:
         except Exception as err:
             logging.exception(f"Something went wrong in updating entry - ConnectDB.update(): {err}")
         finally:
-            self.conn.autocommit = True
+            return response
+
+    # ---------------------------------------------
+    # BULK HELPERS
+    # ---------------------------------------------
+    @staticmethod
+    def build_insert(table, columns, update_columns=None):
+        """INSERT statement for executemany; pymysql rewrites it into multi-row VALUES."""
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        if update_columns:
+            query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{col} = VALUES({col})" for col in update_columns)
+        return query
+
+    @staticmethod
+    def build_bulk_update(table, key_column, rows):
+        """
+        Build CASE-based UPDATE statements, one per slice of DB_BULK_CHUNK_SIZE rows.
+        Each dict in `rows` holds `key_column` plus the columns to set; rows setting
+        the same columns share a statement. Returns a list of (query, [data]) pairs.
+        """
+        grouped = {}
+        for row in rows:
+            columns = tuple(col for col in row if col != key_column)
+            if columns:
+                grouped.setdefault(columns, []).append(row)
+
+        statements = []
+        for columns, group in grouped.items():
+            for start in range(0, len(group), DB_BULK_CHUNK_SIZE):
+                chunk = group[start:start + DB_BULK_CHUNK_SIZE]
+                set_clauses = []
+                data = []
+                for col in columns:
+                    set_clauses.append(
+                        f"{col} = CASE {key_column} "
+                        + " ".join(["WHEN %s THEN %s"] * len(chunk))
+                        + f" ELSE {col} END"
+                    )
+                    for row in chunk:
+                        data.extend((row[key_column], row[col]))
+                data.extend(row[key_column] for row in chunk)
+                query = (
+                    f"UPDATE {table} SET {', '.join(set_clauses)} "
+                    f"WHERE {key_column} IN ({', '.join(['%s'] * len(chunk))})"
+                )
+                statements.append((query, [tuple(data)]))
+        return statements
+
+    def bulk_insert(self, table, columns, rows, update_columns=None):
+        """
+        Insert many rows with multi-row VALUES statements in one transaction.
+
+        Parameters:
+            table (str): Table name, optionally prefixed with the database.
+            columns (list): Column names, in the order of each row tuple.
+            rows (list[tuple]): Row values.
+            update_columns (list, optional): If given, existing rows (same primary/unique key)
+                are updated with INSERT ... ON DUPLICATE KEY UPDATE for these columns.
+        """
+        try:
+            response = {
+                        "status_code": 500,
+                        "status": "failed",
+                        "message": None
+                        }
+            query = self.build_insert(table, columns, update_columns)
+            self.run_in_transaction([(query, [tuple(row) for row in rows])])
+            response = {
+                        "status_code": 200,
+                        "status": "success",
+                        "message": f"{len(rows)} entries inserted successfully"
+                        }
+            logging.info(f"{len(rows)} entries inserted into {table}")
+        except Exception as err:
+            logging.exception(f"Something went wrong in bulk inserting entries - ConnectDB.bulk_insert(): {err}")
+        finally:
+            return response
+
+    def bulk_update(self, table, key_column, rows):
+        """
+        Update many rows with one CASE-based UPDATE per slice of DB_BULK_CHUNK_SIZE rows.
+
+        Parameters:
+            table (str): Table name, optionally prefixed with the database.
+            key_column (str): Column identifying the row.
+            rows (list[dict]): Each dict holds `key_column` plus the columns to set.
+                Rows setting the same columns are grouped into the same statement.
+        """
+        try:
+            response = {
+                        "status_code": 500,
+                        "status": "failed",
+                        "message": None
+                        }
+            self.run_in_transaction(self.build_bulk_update(table, key_column, rows))
+            response = {
+                        "status_code": 200,
+                        "status": "success",
+                        "message": f"{len(rows)} entries updated successfully"
+                        }
+            logging.info(f"{len(rows)} entries updated in {table}")
+        except Exception as err:
+            logging.exception(f"Something went wrong in bulk updating entries - ConnectDB.bulk_update(): {err}")
+        finally:
             return response
 
     def close_connection(self):
+        """Return the connection to the pool."""
         if self.cursor is not None:
             self.cursor.close()
-        if self.conn is not None:
-            self.conn.close()
-        logging.info('Database connection closed')
+            self.cursor = None
+        if self._release is not None:
+            # finalize runs at most once, a later garbage collection does not release again
+            self._release()
+        self.conn = None
+        logging.info('Database connection released to pool')
@@ -0,0 +1,232 @@
+import os
+import json
+from datetime import datetime
+from database.mysql_connection import ConnectDB
+
+
+# MySQL table names
+USERS_TABLE = "users_AI_Portal"
+BATCH_JOBS_TABLE = "batch_jobs_AI_Portal"
+UPLOADED_FILES_TABLE = "uploaded_files_AI_Portal"
+BATCH_FILES_TABLE = "batch_files_AI_Portal"
+PROMPT_FANOUT_TABLE = "prompt_fanout_AI_Portal"
+REVOKED_TOKENS_TABLE = "revoked_tokens_AI_Portal"
+DB_NAME = os.getenv("DB_DATABASE")
+
+
+def fetch_rows(query, params=None):
+    """Run a parameterized SELECT and return the matching rows as a list of dicts"""
+    db = ConnectDB()
+    try:
+        result = db.fetch(query, params)
+    finally:
+        db.close_connection()
+
+    if result["status_code"] == 200 and result["data"]:
+        return result["data"]
+    return []
+
+
+def fetch_one(query, params=None):
+    rows = fetch_rows(query, params)
+    return rows[0] if rows else None
+
+
+def execute_statement(query, params=None):
+    """Run a single parameterized INSERT/UPDATE/DELETE statement"""
+    db = ConnectDB()
+    try:
+        return db.update([{"query": query, "data": params}])
+    finally:
+        db.close_connection()
+
+
+def parse_prompt(row):
+    # prompt is stored as a JSON string, callers expect the decoded list
+    prompt = row.get("prompt")
+    if isinstance(prompt, str):
+        try:
+            row["prompt"] = json.loads(prompt)
+        except (json.JSONDecodeError, ValueError):
+            pass
+    return row
+
+
+# ---------------------------------------------
+# users_AI_Portal
+# ---------------------------------------------
+def get_active_user(user_id, access_token):
+    return fetch_one(
+        f"""SELECT * FROM {DB_NAME}.{USERS_TABLE}
+            WHERE id = %s AND access_token = %s AND LOWER(status) = 'active'
+            LIMIT 1""",
+        (user_id, access_token),
+    )
+
+
+# ---------------------------------------------
+# batch_jobs_AI_Portal
+# ---------------------------------------------
+def get_batch_job(user_id, job_id):
+    row = fetch_one(
+        f"""SELECT * FROM {DB_NAME}.{BATCH_JOBS_TABLE}
+            WHERE user_id = %s AND id = %s AND deleted_at IS NULL
+            LIMIT 1""",
+        (user_id, job_id),
+    )
+    return parse_prompt(row) if row else None
+
+
+def get_batch_jobs(user_id):
+    rows = fetch_rows(
+        f"""SELECT * FROM {DB_NAME}.{BATCH_JOBS_TABLE}
+            WHERE user_id = %s AND deleted_at IS NULL""",
+        (user_id,),
+    )
+    return [parse_prompt(row) for row in rows]
+
+
+# ---------------------------------------------
+# uploaded_files_AI_Portal
+# ---------------------------------------------
+def get_uploaded_files(user_id, job_id, file_id=None):
+    query = f"""SELECT * FROM {DB_NAME}.{UPLOADED_FILES_TABLE}
+                WHERE user_id = %s AND job_id = %s AND deleted_at IS NULL"""
+    params = [user_id, job_id]
+    if file_id is not None:
+        query += " AND file_id = %s"
+        params.append(file_id)
+    return fetch_rows(query, tuple(params))
+
+
+def set_uploaded_file_batch_status(user_id, job_id, file_id, batch_status):
+    return execute_statement(
+        f"""UPDATE {DB_NAME}.{UPLOADED_FILES_TABLE} SET batch_status = %s
+            WHERE user_id = %s AND job_id = %s AND file_id = %s AND deleted_at IS NULL""",
+        (batch_status, user_id, job_id, file_id),
+    )
+
+
+# ---------------------------------------------
+# batch_files_AI_Portal
+# ---------------------------------------------
+def get_batch_files(user_id, job_id=None, batch_id=None):
+    """Batches of one user, optionally restricted to one job and/or batch."""
+    query = f"""SELECT * FROM {DB_NAME}.{BATCH_FILES_TABLE}
+                WHERE user_id = %s AND deleted_at IS NULL"""
+    params = [user_id]
+    if job_id is not None:
+        query += " AND job_id = %s"
+        params.append(job_id)
+    if batch_id is not None:
+        query += " AND batch_id = %s"
+        params.append(batch_id)
+    return fetch_rows(query, tuple(params))
+
+
+def get_pending_batch_files(pending_statuses, user_id=None, job_id=None):
+    """
+    Batches whose status is in `pending_statuses`, with the endpoint/api_key of their job.
+    Optionally restricted to one user and/or job.
+    """
+    query = f"""SELECT bf.user_id, bf.job_id, bf.batch_id, bf.status, bf.output_file_id,
+                       bf.error_file_id, bf.request_counts, bf.in_progress_at, bf.completed_at,
+                       bj.endpoint, bj.api_key
+                FROM {DB_NAME}.{BATCH_FILES_TABLE} bf
+                JOIN {DB_NAME}.{BATCH_JOBS_TABLE} bj ON bj.id = bf.job_id AND bj.user_id = bf.user_id
+                WHERE bf.deleted_at IS NULL AND bj.deleted_at IS NULL
+                  AND bf.status IN ({', '.join(['%s'] * len(pending_statuses))})"""
+    params = list(pending_statuses)
+    if user_id is not None:
+        query += " AND bf.user_id = %s"
+        params.append(user_id)
+    if job_id is not None:
+        query += " AND bf.job_id = %s"
+        params.append(job_id)
+    return fetch_rows(query, tuple(params))
+
+
+# ---------------------------------------------
+# prompt_fanout_AI_Portal
+# ---------------------------------------------
+def get_prompt_fanout(user_id, job_id):
+    return fetch_rows(
+        f"""SELECT custom_id, unique_id FROM {DB_NAME}.{PROMPT_FANOUT_TABLE}
+            WHERE user_id = %s AND job_id = %s""",
+        (user_id, job_id),
+    )
+
+
+# ---------------------------------------------
+# revoked_tokens_AI_Portal
+# ---------------------------------------------
+def get_token_revocations(now):
+    """Revocations that can still match an unexpired token"""
+    return fetch_rows(
+        f"""SELECT jti, user_id, issued_before, expires_at FROM {DB_NAME}.{REVOKED_TOKENS_TABLE}
+            WHERE expires_at >= %s""",
+        (now,),
+    )
+
+
+def add_token_revocation(expires_at, jti=None, user_id=None, issued_before=None):
+    return execute_statement(
+        f"""INSERT INTO {DB_NAME}.{REVOKED_TOKENS_TABLE}
+            (jti, user_id, issued_before, expires_at, created_at)
+            VALUES (%s, %s, %s, %s, %s)""",
+        (jti, user_id, issued_before, expires_at, datetime.now()),
+    )
+
+
+def delete_expired_token_revocations(now):
+    return execute_statement(
+        f"DELETE FROM {DB_NAME}.{REVOKED_TOKENS_TABLE} WHERE expires_at < %s",
+        (now,),
+    )
+
+
+# ---------------------------------------------
+# Inserts / updates
+# ---------------------------------------------
+def to_db_value(value):
+    # lists/dicts (e.g. prompt) are stored as JSON strings
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def insert_rows(table, rows):
+    """
+    Insert new rows into `table` without touching the existing ones.
+    All rows must have the same keys; the keys are used as column names.
+    """
+    if not rows:
+        return {"status_code": 200, "status": "success", "message": "Nothing to insert"}
+
+    columns = list(rows[0].keys())
+    values = [tuple(to_db_value(row.get(col)) for col in columns) for row in rows]
+
+    db = ConnectDB()
+    try:
+        return db.bulk_insert(f"{DB_NAME}.{table}", columns, values)
+    finally:
+        db.close_connection()
+
+
+def update_rows(table, key_column, rows):
+    """
+    Update existing rows of `table` in bulk.
+    Each row holds `key_column` plus the columns to set.
+    """
+    if not rows:
+        return {"status_code": 200, "status": "success", "message": "Nothing to update"}
+
+    db = ConnectDB()
+    try:
+        return db.bulk_update(
+            f"{DB_NAME}.{table}",
+            key_column,
+            [{col: to_db_value(value) for col, value in row.items()} for row in rows],
+        )
+    finally:
+        db.close_connection()
@@ -0,0 +1,148 @@
+import math
+import logging
+import numpy as np
+import pandas as pd
+
+from database.mysql_connection import ConnectDB
+from database.repository import DB_NAME, to_db_value
+
+
+class TrackedDataFrame(pd.DataFrame):
+    """
+    DataFrame returned by the read_* helpers.
+
+    It keeps a snapshot of the rows as they were read, keyed by `key_column`,
+    so the matching write_* helper can persist only the rows and columns that
+    were modified (plus rows that were added) instead of rewriting the table.
+    Everything else behaves like a regular DataFrame.
+    """
+
+    _metadata = ["key_column", "original"]
+
+    @property
+    def _constructor(self):
+        return TrackedDataFrame
+
+    @classmethod
+    def track(cls, dataframe, key_column):
+        tracked = cls(dataframe)
+        tracked.key_column = key_column
+        tracked.original = dataframe.copy()
+        return tracked
+
+    def mark_clean(self):
+        """Take a new snapshot, e.g. after the changes have been persisted."""
+        self.original = pd.DataFrame(self).copy()
+
+    def changes(self):
+        """
+        Compare the current rows with the snapshot.
+
+        Returns:
+            tuple: (new_rows, changed_cells)
+                new_rows (pd.DataFrame): rows whose key was not in the snapshot.
+                changed_cells (dict): {key: {column: new_value}} for modified rows.
+        """
+        key = self.key_column
+        current = pd.DataFrame(self).drop_duplicates(subset=[key], keep="last")
+        original = self.original.drop_duplicates(subset=[key], keep="last")
+
+        current_by_key = current.set_index(key)
+        original_by_key = original.set_index(key)
+
+        is_new = ~current_by_key.index.isin(original_by_key.index)
+        new_rows = current[is_new]
+
+        common_keys = current_by_key.index[~is_new]
+        columns = [col for col in current_by_key.columns if col in original_by_key.columns]
+        now = current_by_key.loc[common_keys, columns]
+        before = original_by_key.loc[common_keys, columns]
+
+        differs = (now != before) & ~(now.isna() & before.isna())
+        changed_cells = {}
+        for row_pos, col_pos in zip(*np.nonzero(differs.to_numpy())):
+            changed_cells.setdefault(common_keys[row_pos], {})[columns[col_pos]] = now.iat[row_pos, col_pos]
+
+        return new_rows, changed_cells
+
+
+def is_tracked(df):
+    """
+    True for frames that still carry the snapshot of TrackedDataFrame.track.
+    Frames derived by e.g. pd.concat or merge are TrackedDataFrames without one,
+    they have to be written in full.
+    """
+    return (
+        isinstance(df, TrackedDataFrame)
+        and getattr(df, "original", None) is not None
+        and getattr(df, "key_column", None) is not None
+    )
+
+
+def clean_value(value):
+    # Replace NaN with None for MySQL
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return to_db_value(value)
+
+
+def check_write(result, table):
+    # ConnectDB reports failures in the result; the frame must stay dirty so the delta is written again
+    if not 200 <= result["status_code"] < 300:
+        raise RuntimeError(f"Writing changes to {table} failed: {result['message'] or result['status']}")
+
+
+def write_tracked_changes(table, df):
+    """
+    Persist only the delta of a TrackedDataFrame:
+    modified columns of modified rows in a bulk UPDATE, new rows in a bulk INSERT.
+    Only for frames that pass is_tracked.
+
+    Raises:
+        RuntimeError: If a write failed; the frame keeps its changes, a later write retries them.
+    """
+    key = df.key_column
+    new_rows, changed_cells = df.changes()
+
+    update_rows = [
+        {key: key_value, **{col: clean_value(value) for col, value in cells.items()}}
+        for key_value, cells in changed_cells.items()
+    ]
+
+    columns = list(new_rows.columns)
+    insert_rows = []
+    db = ConnectDB()
+    try:
+        if not new_rows.empty:
+            # Rows added to the frame may still exist in the table (written by another request)
+            new_keys = new_rows[key].tolist()
+            existing = db.fetch(
+                f"SELECT {key} FROM {DB_NAME}.{table} WHERE {key} IN ({', '.join(['%s'] * len(new_keys))})",
+                tuple(new_keys),
+            )
+            existing_ids = {row[key] for row in (existing["data"] or [])}
+
+            for row in new_rows.to_dict(orient="records"):
+                row = {col: clean_value(value) for col, value in row.items()}
+                if row[key] in existing_ids:
+                    update_rows.append(row)
+                else:
+                    insert_rows.append(tuple(row[col] for col in columns))
+
+        if not update_rows and not insert_rows:
+            logging.info(f"No changes to write for {table}")
+            return changed_cells
+
+        # Execute updates
+        if update_rows:
+            check_write(db.bulk_update(f"{DB_NAME}.{table}", key, update_rows), table)
+
+        # Execute inserts
+        if insert_rows:
+            check_write(db.bulk_insert(f"{DB_NAME}.{table}", columns, insert_rows), table)
+    finally:
+        db.close_connection()
+
+    df.mark_clean()
+    logging.info(f"{len(update_rows)} rows updated and {len(insert_rows)} rows inserted in {table}")
+    return changed_cells
@@ -0,0 +1,68 @@
+import logging
+
+from database.mysql_connection import ConnectDB
+from database.repository import DB_NAME, to_db_value
+
+
+class UnitOfWork:
+    """
+    Collects the rows a request creates or modifies and writes them
+    all in one transaction on flush().
+
+    Usage:
+        with UnitOfWork() as uow:
+            uow.add(BATCH_JOBS_TABLE, job_row)
+            uow.add_all(UPLOADED_FILES_TABLE, file_rows)
+            uow.update(UPLOADED_FILES_TABLE, "file_id", {"file_id": file_id, "batch_status": "started"})
+        # flushed here, unless the block raised
+    """
+
+    def __init__(self):
+        self.inserts = {}
+        self.updates = {}
+
+    def add(self, table, row):
+        self.inserts.setdefault(table, []).append(row)
+
+    def add_all(self, table, rows):
+        for row in rows:
+            self.add(table, row)
+
+    def update(self, table, key_column, row):
+        """Queue an update; `row` holds `key_column` plus the columns to set."""
+        self.updates.setdefault((table, key_column), []).append(row)
+
+    def statements(self):
+        statements = []
+        for table, rows in self.inserts.items():
+            columns = list(rows[0].keys())
+            values = [tuple(to_db_value(row.get(col)) for col in columns) for row in rows]
+            statements.append((ConnectDB.build_insert(f"{DB_NAME}.{table}", columns), values))
+        for (table, key_column), rows in self.updates.items():
+            rows = [{col: to_db_value(value) for col, value in row.items()} for row in rows]
+            statements.extend(ConnectDB.build_bulk_update(f"{DB_NAME}.{table}", key_column, rows))
+        return statements
+
+    def flush(self):
+        statements = self.statements()
+        if not statements:
+            return
+        db = ConnectDB()
+        try:
+            db.run_in_transaction(statements)
+        finally:
+            db.close_connection()
+        logging.info(
+            f"Unit of work flushed: {sum(len(rows) for rows in self.inserts.values())} inserts, "
+            f"{sum(len(rows) for rows in self.updates.values())} updates in {len(statements)} statements"
+        )
+        self.inserts = {}
+        self.updates = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
@@ -1,11 +1,11 @@
 import uuid
-import pandas as pd
 
 
 from datetime import datetime
 
 
-from .utils import read_jobs, write_jobs, clean_nans
+from .utils import read_jobs, write_jobs, clean_nans, JOBS_TABLE
+from database import repository
 
 
 def get_jobs_by_user_id(user_id: str):
@@ -30,8 +30,6 @@ def get_jobs_by_user_id(user_id: str):
 
 
 def append_job_history(user_id: str, job_data: dict):
-    df = read_jobs()
-
     # Create a new job entry
     new_job = {
         "id": str(uuid.uuid4()),
@@ -52,11 +50,8 @@ def append_job_history(user_id: str, job_data: dict):
         "deleted_at": None,
     }
 
-    # Append to DataFrame
-    df = pd.concat([df, pd.DataFrame([new_job])], ignore_index=True)
-
-    # Write back
-    write_jobs(df)
+    # Insert only the new row
+    repository.insert_rows(JOBS_TABLE, [new_job])
 
     return {
         "status_code": 201,
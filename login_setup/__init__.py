@@ -1,4 +1,5 @@
 from .router import login_router, login
 from .main import authenticate_user_token
+from .cache import auth_cache, invalidate_user
 
-__all__ = ["login", "login_router", "authenticate_user_token"]
+__all__ = ["login", "login_router", "authenticate_user_token", "auth_cache", "invalidate_user"]
@@ -2,6 +2,15 @@ import uuid
 
 
 from .utils import read_users, write_users
+from .cache import auth_cache, invalidate_user
+from .tokens import (
+    signed_tokens_enabled,
+    is_signed_token,
+    issue_token,
+    verify_token,
+    revocation_list,
+)
+from database import repository
 
 
 def validate_user(email: str, password: str):
@@ -17,9 +26,15 @@ def validate_user(email: str, password: str):
 
     # Success case
     if user["password"] == password and str(user["status"]).lower() == "active":
-        new_token = str(uuid.uuid4())
+        if signed_tokens_enabled():
+            # A new login replaces older tokens, same as rotating the uuid token
+            revocation_list.revoke_user(user["id"])
+            new_token = issue_token(user["id"], user["role"])
+        else:
+            new_token = str(uuid.uuid4())
         df.at[idx, "access_token"] = new_token
         write_users(df)
+        invalidate_user(user["id"])
 
         return {
             "status_code": 200,
@@ -41,18 +56,43 @@ def authenticate_user_token(user_id: str, access_token: str) -> bool:
     Returns True if valid, otherwise False.
     """
     try:
-        df = read_users()
-        user = df[
-            (df["id"] == user_id)
-            & (df["access_token"] == access_token)
-            & (df["status"].str.lower() == "active")
-        ]
+        # Signed tokens are verified without touching the database
+        if signed_tokens_enabled() and is_signed_token(access_token):
+            claims = verify_token(access_token)
+            return claims is not None and claims["sub"] == str(user_id)
+
+        if auth_cache.get((user_id, access_token)):
+            return True
 
-        return not user.empty  # True if user exists
+        user = repository.get_active_user(user_id, access_token)
+        if user is None:
+            return False
+
+        auth_cache.set((user_id, access_token), True)
+        return True  # True if user exists
     except Exception:
         return False
 
 
+def logout_user(user_id: str, access_token: str):
+    """Invalidate the given access token."""
+    if signed_tokens_enabled() and is_signed_token(access_token):
+        claims = verify_token(access_token)
+        if claims is None or claims["sub"] != str(user_id):
+            return {"status_code": 401, "message": "unauthorized"}
+        revocation_list.revoke_token(claims["jti"], claims["exp"])
+    else:
+        df = read_users()
+        mask = (df["id"] == user_id) & (df["access_token"] == access_token)
+        if not mask.any():
+            return {"status_code": 401, "message": "unauthorized"}
+        df.loc[mask, "access_token"] = None
+        write_users(df)
+
+    invalidate_user(user_id)
+    return {"status_code": 200, "user_id": user_id, "message": "Logout Successful"}
+
+
 def get_user_by_id(user_id: str):
     df = read_users()
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Response, HTTPException
-from .main import validate_user, authenticate_user_token, get_user_by_id
+from .main import validate_user, authenticate_user_token, get_user_by_id, logout_user
 
 
 login_router = APIRouter()
@@ -21,3 +21,10 @@ def validate_token(user_id: str, access_token: str, response: Response):
         result = get_user_by_id(user_id)
         response.status_code = result.get("status_code", 200)
         return result
+
+
+@login_router.post("/logout/")
+def logout(user_id: str, access_token: str, response: Response):
+    result = logout_user(user_id, access_token)
+    response.status_code = result.get("status_code", 200)
+    return result
@@ -0,0 +1,172 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import base64
+import hashlib
+import logging
+import threading
+
+
+from database import repository
+
+
+# "uuid" (default): random token stored in users_AI_Portal, checked against the database.
+# "signed": HMAC-SHA256 signed token carrying user_id/role/expiry, checked without a database
+# lookup per request (revocations are reloaded every AUTH_REVOCATION_REFRESH seconds).
+AUTH_TOKEN_MODE = os.getenv("AUTH_TOKEN_MODE", "uuid").lower()
+AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET", "")
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 60 * 60)))
+# Seconds between reloads of the revocations made by other workers
+AUTH_REVOCATION_REFRESH = float(os.getenv("AUTH_REVOCATION_REFRESH", "30"))
+# Width of users_AI_Portal.access_token (migration 0005), signed tokens are stored there
+ACCESS_TOKEN_MAX_LENGTH = 512
+
+
+def signed_tokens_enabled():
+    return AUTH_TOKEN_MODE == "signed" and bool(AUTH_TOKEN_SECRET)
+
+
+def b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign(payload: str) -> str:
+    digest = hmac.new(AUTH_TOKEN_SECRET.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest()
+    return b64encode(digest)
+
+
+class RevocationList:
+    """
+    Revoked tokens, shared by every worker through the revoked_tokens_AI_Portal table.
+    - Single tokens (logout) are kept by their `jti` until they would have expired anyway.
+    - Whole users (deactivation, new login) are revoked by remembering a cut-off time:
+      every token of that user issued before it is rejected.
+
+    Revocations are written to the database and kept in process. Checks use the
+    in-process copy and reload it from the database every `refresh_interval` seconds,
+    so a revocation made by another worker applies within that time.
+    """
+
+    def __init__(self, refresh_interval=AUTH_REVOCATION_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._tokens = {}
+        self._users = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def _add(self, jti=None, user_id=None, issued_before=None, expires_at=None):
+        # Caller holds the lock
+        if jti is not None:
+            self._tokens[jti] = max(expires_at, self._tokens.get(jti, expires_at))
+        if user_id is not None:
+            self._users[str(user_id)] = max(issued_before, self._users.get(str(user_id), issued_before))
+
+    def _prune(self, now):
+        for expired in [key for key, exp in self._tokens.items() if exp < now]:
+            del self._tokens[expired]
+        # No token issued before cut_off is still valid after cut_off + AUTH_TOKEN_TTL
+        for expired in [key for key, cut_off in self._users.items() if cut_off + AUTH_TOKEN_TTL < now]:
+            del self._users[expired]
+
+    def _store(self, **revocation):
+        try:
+            result = repository.add_token_revocation(**revocation)
+            if result["status_code"] != 200:
+                raise RuntimeError(result["message"])
+        except Exception as err:
+            logging.error(f"Revocation only applies to this process, storing it failed: {err}")
+
+    def revoke_token(self, jti, expires_at):
+        with self._lock:
+            self._add(jti=jti, expires_at=expires_at)
+        self._store(jti=jti, expires_at=expires_at)
+
+    def revoke_user(self, user_id, issued_before=None):
+        issued_before = issued_before if issued_before is not None else time.time()
+        with self._lock:
+            self._add(user_id=user_id, issued_before=issued_before)
+        self._store(user_id=str(user_id), issued_before=issued_before, expires_at=issued_before + AUTH_TOKEN_TTL)
+
+    def refresh(self):
+        """Load the revocations of every worker and drop the expired ones."""
+        now = time.time()
+        rows = repository.get_token_revocations(now)
+        repository.delete_expired_token_revocations(now)
+        with self._lock:
+            # Merged into what this process knows, a failed read never forgets a revocation
+            for row in rows:
+                self._add(row["jti"], row["user_id"], row["issued_before"], row["expires_at"])
+            self._prune(now)
+
+    def _refresh_due(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._refreshed_at is not None and now - self._refreshed_at <= self.refresh_interval:
+                return False
+            # Claimed by this thread, the others keep checking against the current copy meanwhile
+            self._refreshed_at = now
+            return True
+
+    def is_revoked(self, claims):
+        if self._refresh_due():
+            try:
+                self.refresh()
+            except Exception as err:
+                logging.warning(f"Could not reload revoked tokens: {err}")
+        with self._lock:
+            if claims.get("jti") in self._tokens:
+                return True
+            cut_off = self._users.get(claims.get("sub"))
+            return cut_off is not None and claims.get("iat", 0) < cut_off
+
+
+revocation_list = RevocationList()
+
+
+def issue_token(user_id, role):
+    """Create a signed access token for `user_id`, valid for AUTH_TOKEN_TTL seconds."""
+    now = time.time()
+    claims = {
+        "sub": str(user_id),
+        "role": role,
+        "iat": now,
+        "exp": now + AUTH_TOKEN_TTL,
+        "jti": uuid.uuid4().hex,
+    }
+    payload = b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    token = f"{payload}.{sign(payload)}"
+    if len(token) > ACCESS_TOKEN_MAX_LENGTH:
+        # Would be truncated in users_AI_Portal.access_token and never verify
+        raise ValueError(f"Signed token of {len(token)} characters exceeds {ACCESS_TOKEN_MAX_LENGTH}")
+    return token
+
+
+def verify_token(token):
+    """
+    Check signature, expiry and revocation of a signed token.
+
+    Returns:
+        dict: The token claims if the token is valid, otherwise None.
+    """
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, sign(payload)):
+            return None
+        claims = json.loads(b64decode(payload))
+    except Exception:
+        return None
+
+    if claims.get("exp", 0) < time.time() or revocation_list.is_revoked(claims):
+        return None
+    return claims
+
+
+def is_signed_token(token):
+    # uuid4 tokens never contain a "."
+    return isinstance(token, str) and token.count(".") == 1
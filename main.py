@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
@@ -11,7 +12,15 @@ import batch_process
 import batch_history
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep batch statuses up to date in the background (BATCH_STATUS_POLLER)
+    batch_history.batch_status_poller.start()
+    yield
+    await batch_history.batch_status_poller.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow all origins, methods, and headers
 app.add_middleware(
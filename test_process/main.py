@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 
@@ -5,7 +6,7 @@ from .utils import execute_test_process
 from job_history import append_job_history
 
 
-def test_prompt_process(user_id, file_name, dataframe, description_json):
+async def test_prompt_process(user_id, file_name, dataframe, description_json):
     job_title = description_json["job_title"]
     prompt = description_json["prompt"]
     placeholder_field = description_json["placeholder_field"]
@@ -14,7 +15,7 @@ def test_prompt_process(user_id, file_name, dataframe, description_json):
     chunk_size = description_json["config"]["chunkSize"]
     credentials = description_json["credentials"]
 
-    result = execute_test_process(
+    result = await execute_test_process(
         dataframe=dataframe,
         job_title=job_title,
         prompt=prompt,
@@ -40,7 +41,8 @@ def test_prompt_process(user_id, file_name, dataframe, description_json):
             "avg_cost_per_row": result["average_cost_per_row"],
             "prompt": [prompt]
         }
-        append_job_history(user_id, job_data)
+        # Database write is blocking, keep it off the event loop
+        await asyncio.to_thread(append_job_history, user_id, job_data)
     except Exception as err:
         logging.info(f"Got error while appending test-job: {err}")
 
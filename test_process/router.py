@@ -2,9 +2,9 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response
 
 from .main import test_prompt_process
 from login_setup import authenticate_user_token
-import pandas as pd
-import io
+from common.ingest import read_upload, UnsupportedFileType
 import json
+import asyncio
 
 
 test_process_router = APIRouter()
@@ -41,19 +41,15 @@ async def test_prompt(
             response.status_code = 400
             raise HTTPException(status_code=400, detail="Invalid JSON in description")
 
-        contents = await file.read()
-
-        # Decide based on file extension
-        if file.filename and file.filename.endswith(".csv"):
-            df = pd.read_csv(io.BytesIO(contents))
-        elif file.filename and (
-            file.filename.endswith(".xlsx") or file.filename.endswith(".xls")
-        ):
-            df = pd.read_excel(io.BytesIO(contents), engine="openpyxl")
-        else:
+        # Decide based on file extension; only the rows that are tested are parsed
+        try:
+            df = await asyncio.to_thread(
+                read_upload, file.file, file.filename, description_json["config"]["chunkSize"]
+            )
+        except UnsupportedFileType:
             response.status_code = 400
             raise HTTPException(status_code=400, detail="Unsupported file type")
-        result = test_prompt_process(user_id, file.filename, df, description_json)
+        result = await test_prompt_process(user_id, file.filename, df, description_json)
         response.status_code = 200
         return result
 
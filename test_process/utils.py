@@ -1,16 +1,19 @@
 import io
+import os
 import base64
-import threading
+import asyncio
 import pandas as pd
 import logging
 import json
 import re
-import time
 
 
 from tqdm import tqdm
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+
+
+from common import get_async_azure_client, compile_template
+from common.rate_limiter import get_rate_limiter, create_chat_completion
 
 
 # Load environment variables
@@ -21,8 +24,12 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Concurrent GPT calls per test run and time budget per row (seconds)
+TEST_CONCURRENCY = int(os.getenv("TEST_CONCURRENCY", "10"))
+TEST_ROW_TIMEOUT = float(os.getenv("TEST_ROW_TIMEOUT", "180"))
 
-def genai_keyword_category_mapping(
+
+async def genai_keyword_category_mapping(
     row,
     job_title,
     prompt,
@@ -38,20 +45,11 @@ def genai_keyword_category_mapping(
     - On success, it returns the original data plus the AI-generated output.
     """
     try:
-        # ---- Step 1: Fill placeholders dynamically ----
-        prompt_filled = prompt
-        placeholders = re.findall(r"\{\{(.*?)\}\}", prompt)
-
-        for placeholder in placeholders:
-            column_name = placeholder_field.get(placeholder)
-            if column_name and column_name in row and pd.notna(row[column_name]):
-                value = str(row[column_name])
-            else:
-                value = f"<MISSING_{placeholder}>"
-            prompt_filled = prompt_filled.replace(f"{{{{{placeholder}}}}}", value)
+        # ---- Step 1: Fill placeholders dynamically (template parsed once per prompt) ----
+        prompt_filled = compile_template(prompt).render_row(row, placeholder_field)
 
         # ---- Step 2: Call GPT ----
-        gpt_response, usage = call_gpt_llm_client(
+        gpt_response, usage = await call_gpt_llm_client(
             prompt_filled,
             credentials,
             model=credentials.get("deploymentName", "gpt-4o-mini"),
@@ -93,36 +91,34 @@ def genai_keyword_category_mapping(
     return result
 
 
-def call_gpt_llm_client(
-    prompt, credentials, model="gpt-4o-mini", temperature=0.3, time_delay=60
+async def call_gpt_llm_client(
+    prompt, credentials, model="gpt-4o-mini", temperature=0.3, retries=5
 ):
     """
-    Calls Azure GPT LLM client and handles retries.
+    Calls Azure GPT LLM client through the deployment's shared rate limiter
+    and handles retries (exponential backoff, honoring Retry-After).
     """
-    client = AzureOpenAI(
-        api_key=credentials.get("apiKey"),
-        azure_endpoint=credentials.get("endpoint"),
-        api_version=credentials.get("api_version", "2024-05-01-preview"),
+    client = get_async_azure_client(
+        credentials.get("endpoint"),
+        credentials.get("apiKey"),
+        credentials.get("api_version", "2024-05-01-preview"),
+    )
+    limiter = get_rate_limiter(
+        credentials.get("endpoint"),
+        model,
+        rpm=credentials.get("rpm"),
+        tpm=credentials.get("tpm"),
     )
 
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "system", "content": prompt}],
-                temperature=temperature,
-            )
-            return response.choices[0].message.content, response.usage
-        except Exception as e:
-            logging.warning(f"Retry {attempt + 1}/{retries} failed: {e}")
-            if attempt < retries - 1:
-                time.sleep(time_delay)
-            else:
-                # If this is the last retry, re-raise the exception
-                raise e
-    # This line is technically unreachable due to the raise in the loop but is good practice
-    raise RuntimeError("Max retries exceeded in GPT call")
+    response = await create_chat_completion(
+        client,
+        limiter,
+        retries=retries,
+        model=model,
+        messages=[{"role": "system", "content": prompt}],
+        temperature=temperature,
+    )
+    return response.choices[0].message.content, response.usage
 
 
 def handling_gpt_output(gpt_response):
@@ -153,7 +149,7 @@ def handling_gpt_output(gpt_response):
     return {"raw_output": gpt_response.strip()}
 
 
-def execute_threads(
+async def execute_rows(
     dataframe,
     job_title,
     prompt,
@@ -161,44 +157,48 @@ def execute_threads(
     placeholder_field,
     output_field,
     credentials,
-    thread_count,
+    concurrency,
+    row_timeout=TEST_ROW_TIMEOUT,
 ):
     """
-    Multithreaded processing of rows.
-    Manages its own local list for results.
+    Concurrent processing of rows on the event loop.
+    - At most `concurrency` GPT calls are in flight at any time.
+    - Each row gets `row_timeout` seconds; a timed out row is returned with an 'error'.
+    - Results keep the input order of the rows (and therefore of their unique IDs).
     """
-    local_output_list = []
-    output_lock = threading.Lock()
-
-    threads = []
+    semaphore = asyncio.Semaphore(concurrency)
     progress = tqdm(total=len(dataframe), desc="Processing Rows")
 
-    def worker(rows):
-        for _, row in rows.iterrows():
-            result = genai_keyword_category_mapping(
-                row,
-                job_title,
-                prompt,
-                placeholder_field,
-                unique_id_column,
-                output_field,
-                credentials,
-            )
-            with output_lock:
-                local_output_list.append(result)
-
-            progress.update(1)
-
-    thread_chunk_size = len(dataframe) // thread_count
-    for i in range(thread_count):
-        start = i * thread_chunk_size
-        end = None if i == thread_count - 1 else (i + 1) * thread_chunk_size
-        thread = threading.Thread(target=worker, args=(dataframe.iloc[start:end],))
-        threads.append(thread)
-        thread.start()
-
-    for thread in threads:
-        thread.join()
+    async def worker(row):
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    genai_keyword_category_mapping(
+                        row,
+                        job_title,
+                        prompt,
+                        placeholder_field,
+                        unique_id_column,
+                        output_field,
+                        credentials,
+                    ),
+                    timeout=row_timeout,
+                )
+            except asyncio.TimeoutError:
+                logging.error(
+                    f"Row with ID '{row.get(unique_id_column, 'N/A')}' timed out after {row_timeout}s"
+                )
+                result = row.to_dict()
+                result["total_tokens"] = None
+                result["input_tokens"] = None
+                result["completion_tokens"] = None
+                result["error"] = f"Timed out after {row_timeout}s"
+        progress.update(1)
+        return result
+
+    local_output_list = await asyncio.gather(
+        *(worker(row) for _, row in dataframe.iterrows())
+    )
 
     progress.close()
 
@@ -251,7 +251,7 @@ def generate_summary_json(
     return summary
 
 
-def execute_test_process(
+async def execute_test_process(
     dataframe,
     job_title,
     prompt,
@@ -282,7 +282,7 @@ def execute_test_process(
 
     test_df = dataframe.head(chunk_size)
 
-    output_df = execute_threads(
+    output_df = await execute_rows(
         test_df,
         job_title,
         prompt,
@@ -290,7 +290,7 @@ def execute_test_process(
         placeholder_field,
         output_field,
         credentials,
-        thread_count=10,
+        concurrency=TEST_CONCURRENCY,
     )
 
     output_df.to_csv("test-output.csv", index=False)
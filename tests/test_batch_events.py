@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from batch_history import router
+from batch_history.events import batch_event_bus
+from database import repository
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def read_events(response, count):
+    async def collect():
+        events = []
+        async for message in response.body_iterator:
+            if message.startswith("event: batch_status"):
+                events.append(json.loads(message.split("data: ", 1)[1]))
+            if len(events) == count:
+                break
+        await response.body_iterator.aclose()
+        return events
+
+    return collect()
+
+
+def test_stream_starts_with_the_stored_state_of_the_job(monkeypatch):
+    stored = [
+        {"job_id": "j1", "batch_id": "b1", "status": "completed", "output_file_id": "o1",
+         "request_counts": '{"total": 2, "completed": 2, "failed": 0}'},
+        {"job_id": "j1", "batch_id": "b2", "status": "in_progress", "output_file_id": None,
+         "request_counts": None},
+    ]
+
+    def get_batch_files(user_id, job_id=None, batch_id=None):
+        # A change published while the snapshot is read still reaches the stream
+        batch_event_bus.publish(user_id, {"job_id": "j1", "batch_id": "b2", "status": "completed"})
+        return [row for row in stored if job_id in (None, row["job_id"])]
+
+    monkeypatch.setattr(router, "authenticate_user_token", lambda user_id, access_token: True)
+    monkeypatch.setattr(repository, "get_batch_files", get_batch_files)
+
+    async def run():
+        response = await router.stream_batch_events("7", "token", FakeRequest(), job_id="j1")
+        return await read_events(response, 3)
+
+    events = asyncio.run(run())
+
+    assert [(event["batch_id"], event["status"]) for event in events] == [
+        ("b1", "completed"), ("b2", "in_progress"), ("b2", "completed"),
+    ]
+    assert events[0]["request_counts"] == {"total": 2, "completed": 2, "failed": 0}
+    assert not batch_event_bus.has_subscribers("7")
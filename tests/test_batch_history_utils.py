@@ -0,0 +1,50 @@
+import pandas as pd
+
+from batch_history import utils
+
+
+class FakeDB:
+    def __init__(self, existing_ids):
+        self.existing_ids = existing_ids
+        self.updates = []
+        self.inserts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def fetch(self, query, params=None):
+        return {"status_code": 200, "data": [{"batch_id": batch_id} for batch_id in self.existing_ids]}
+
+    def update(self, queries):
+        self.updates.extend(queries)
+        return {"status_code": 200}
+
+    def insert(self, queries):
+        self.inserts.extend(queries)
+        return {"status_code": 200}
+
+
+def test_plain_frame_writes_lifecycle_columns(monkeypatch):
+    db = FakeDB(existing_ids={"batch_1"})
+    monkeypatch.setattr(utils, "ConnectDB", lambda: db)
+    df = pd.DataFrame(
+        {
+            "batch_id": ["batch_1", "batch_2"],
+            "status": ["failed", "completed"],
+            "error_file_id": ["file_err", None],
+            "request_counts": [{"total": 2, "failed": 2}, {"total": 1, "completed": 1}],
+        }
+    )
+
+    utils.write_batch_files(df)
+
+    (update,) = db.updates
+    assert "error_file_id = %s" in update["query"] and "request_counts = %s" in update["query"]
+    # Columns missing from the frame are left alone
+    assert "output_file_id" not in update["query"]
+    assert update["data"] == ("failed", "file_err", '{"total": 2, "failed": 2}', "batch_1")
+    (insert,) = db.inserts
+    assert insert["data"] == ("batch_2", "completed", None, '{"total": 1, "completed": 1}')
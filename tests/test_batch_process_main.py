@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+
+from batch_process import main
+from database.unit_of_work import UnitOfWork
+
+
+def test_started_batches_are_logged_when_the_flush_fails(monkeypatch, caplog):
+    started = [{"batch_id": "batch_1", "file_id": "file_1", "status": "validating"}]
+    monkeypatch.setattr(main.steps.start_batch_job, "start_process", lambda *args, **kwargs: started)
+
+    def flush(self):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(UnitOfWork, "flush", flush)
+
+    with caplog.at_level(logging.ERROR), pytest.raises(ConnectionError):
+        main.start_batch_of_file_ids("user_1", "job_1", ["file_1"])
+
+    assert "job_1" in caplog.text and "batch_1" in caplog.text
+
+
+def test_chunks_that_failed_to_upload_are_not_started_or_queued(monkeypatch):
+    from batch_process.steps import start_batch_job
+    from database import repository
+
+    uploaded_rows = [
+        {"file_id": "file_1", "chunk_no": "chunk_1", "total_rows_processed": 10},
+        {"file_id": None, "chunk_no": "chunk_2", "total_rows_processed": 10},
+        {"file_id": "file_3", "chunk_no": "chunk_3", "total_rows_processed": 12},
+    ]
+    started = []
+
+    def start_and_check_batch(client, file_id):
+        started.append(file_id)
+        return {"batch_id": f"batch_{file_id}", "file_id": file_id, "status": "validating"}
+
+    flushed = []
+    monkeypatch.setattr(start_batch_job, "get_openai_client", lambda user_id, job_id: object())
+    monkeypatch.setattr(start_batch_job, "start_and_check_batch", start_and_check_batch)
+    monkeypatch.setattr(repository, "get_uploaded_files", lambda user_id, job_id: uploaded_rows)
+    monkeypatch.setattr(UnitOfWork, "flush", lambda self: flushed.append((self.inserts, self.updates)))
+
+    result = main.start_batch_of_job_id("user_1", "job_1")
+
+    assert sorted(started) == ["file_1", "file_3"]
+    assert result["batch_count"] == 2
+    ((inserts, updates),) = flushed
+    assert [row["file_id"] for rows in inserts.values() for row in rows] == ["file_1", "file_3"]
+    assert [row["file_id"] for rows in updates.values() for row in rows] == ["file_1", "file_3"]
@@ -0,0 +1,29 @@
+import base64
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from batch_process import utils
+from batch_process.utils import convert_csv_file_to_bytes, stream_json_with_file
+
+
+def test_csv_is_streamed_as_base64_block_by_block(monkeypatch):
+    monkeypatch.setattr(utils, "FILE_ENCODE_BLOCK_SIZE", 6)
+    csv_file = tempfile.TemporaryFile()
+    content = "id,prompt\n1,ü \"quoted\"\n2,日本\n".encode("utf-8")
+    csv_file.write(content)
+    preview = pd.DataFrame({"id": np.array([1, 2]), "prompt": ["ü", None]})
+
+    summary = convert_csv_file_to_bytes(csv_file, 2, preview)
+    summary["job_title"] = ("title",)
+    pieces = list(stream_json_with_file(summary))
+
+    assert len(pieces) > 3
+    body = json.loads(b"".join(pieces))
+    assert base64.b64decode(body["file_data"]) == content
+    assert body["total_test_rows_processed"] == 2
+    assert body["row_preview_data"] == [{"id": 1, "prompt": "ü"}, {"id": 2, "prompt": "N/A"}]
+    assert body["job_title"] == ["title"]
+    assert csv_file.closed
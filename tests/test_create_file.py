@@ -0,0 +1,67 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from batch_process.steps import create_file
+from common.prompt_template import missing_value
+
+
+PROMPT = "Name: {{ name }} | count: {{count}} | price: {{price}} | day: {{day}} | flag: {{flag}} | code: {{code}} | {{mixed}}{{name}}"
+PLACEHOLDER_FIELDS = {
+    "name": "name",
+    "count": "count",
+    "price": "price",
+    "day": "day",
+    "flag": "flag",
+    "code": "code",
+    "mixed": "mixed",
+}
+
+
+def mixed_frame():
+    return pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "name": ["a", "ü \\1 $0 {{x}}", None, "tab\there"],
+            "count": [1, 2, 3, 4],
+            "price": [1.5, np.nan, 0.1 + 0.2, 1e20],
+            "day": pd.to_datetime(["2024-01-01", "2024-06-30 12:30:00", None, "1999-12-31"], format="ISO8601"),
+            "flag": [True, False, True, False],
+            "code": pd.array(["007", None, "x", ""], dtype="string"),
+            "mixed": [1, "two", 3.0, None],
+        }
+    )
+
+
+def render_row_baseline(prompt, row, placeholder_fields):
+    # The per-row renderer this replaced: one re.sub per placeholder and row, with str(value).
+    # Missing cells render as <MISSING_placeholder>.
+    for placeholder, col_name in placeholder_fields.items():
+        value = row[col_name]
+        text = missing_value(placeholder) if pd.isna(value) else str(value)
+        prompt = re.sub(r"\{\{\s*" + re.escape(placeholder) + r"\s*\}\}", lambda _: text, prompt)
+    return prompt
+
+
+def test_render_prompts_matches_row_baseline():
+    df = mixed_frame()
+
+    expected = [render_row_baseline(PROMPT, row, PLACEHOLDER_FIELDS) for _, row in df.iterrows()]
+
+    rendered = create_file.render_prompts(df, PROMPT, PLACEHOLDER_FIELDS)
+    assert rendered["prompt"].tolist() == expected
+    assert rendered.drop(columns="prompt").equals(df)
+
+
+def test_replace_placeholders_with_col_values_matches_row_baseline():
+    df = mixed_frame()
+    # Rows carry their own template, rendered grouped by template
+    df["prompt"] = [PROMPT, "{{count}} only", PROMPT, "{{count}} only"]
+    df.index = [10, 11, 12, 13]
+
+    expected = [render_row_baseline(row["prompt"], row, PLACEHOLDER_FIELDS) for _, row in df.iterrows()]
+
+    rendered = create_file.replace_placeholders_with_col_values(df, PLACEHOLDER_FIELDS)
+    assert rendered["prompt"].tolist() == expected
+    assert rendered.index.tolist() == [0, 1, 2, 3]
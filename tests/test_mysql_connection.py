@@ -0,0 +1,86 @@
+import gc
+
+import pytest
+
+from database import mysql_connection
+from database.mysql_connection import ConnectDB, ConnectionPool
+
+
+class FakeConnection:
+    open = True
+
+    def autocommit(self, value):
+        pass
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ConnectionPool(size=2, timeout=0.1)
+    monkeypatch.setattr(mysql_connection, "create_connection", FakeConnection)
+    monkeypatch.setattr(mysql_connection, "get_pool", lambda: pool)
+    return pool
+
+
+def test_context_manager_releases_the_connection(pool):
+    for _ in range(5):
+        with ConnectDB() as db:
+            assert db.conn is not None
+    assert pool._idle.qsize() == 1
+
+
+def test_context_manager_releases_the_connection_on_error(pool):
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            with ConnectDB():
+                raise RuntimeError("query failed")
+    with ConnectDB() as db:
+        assert db.conn is not None
+
+
+def test_unclosed_connection_is_released_when_collected(pool):
+    for _ in range(5):
+        ConnectDB()
+        gc.collect()
+    with ConnectDB() as db:
+        assert db.conn is not None
+
+
+def test_close_connection_releases_once(pool):
+    db = ConnectDB()
+    db.close_connection()
+    db.close_connection()
+    del db
+    gc.collect()
+    assert pool._idle.qsize() == 1
+    # Both slots are still free
+    first, second = ConnectDB(), ConnectDB()
+    assert first.conn is not None and second.conn is not None
+
+
+def test_group_by_query_keeps_the_order_of_interleaved_statements():
+    statements = [
+        {"query": "UPDATE a", "data": (1,)},
+        {"query": "UPDATE a", "data": (2,)},
+        {"query": "UPDATE b", "data": (3,)},
+        {"query": "UPDATE a", "data": (4,)},
+    ]
+
+    assert ConnectDB.group_by_query(statements) == [
+        ("UPDATE a", [(1,), (2,)]),
+        ("UPDATE b", [(3,)]),
+        ("UPDATE a", [(4,)]),
+    ]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from common.prompt_template import compile_template, render_prompts
+
+
+PROMPT = "Day: {{day}} | When: {{when}} | price: {{price}} | count: {{count}} | flag: {{flag}} | name: {{name}} | {{unmapped}}"
+PLACEHOLDER_FIELDS = {"day": "day", "when": "when", "price": "price", "count": "count", "flag": "flag", "name": "name"}
+
+
+def mixed_frame():
+    return pd.DataFrame(
+        {
+            # Dates only: astype(str) drops the time, str(Timestamp) does not
+            "day": pd.to_datetime(["2024-01-01", "2024-01-02", None]),
+            "when": pd.to_datetime(["2024-01-01", "2024-06-30 12:30:00", None], format="ISO8601"),
+            "price": [1.5, np.nan, 0.1 + 0.2],
+            "count": [1, 2, 3],
+            "flag": [True, False, True],
+            "name": ["a", None, "ü \\1 {{x}}"],
+        }
+    )
+
+
+def test_frame_rendering_matches_row_rendering():
+    df = mixed_frame()
+    template = compile_template(PROMPT)
+
+    # The test job renders row by row from iterrows
+    expected = [template.render_row(row, PLACEHOLDER_FIELDS) for _, row in df.iterrows()]
+
+    assert render_prompts(df, PROMPT, PLACEHOLDER_FIELDS).tolist() == expected
+
+
+def test_datetime_float_and_missing_values():
+    rendered = render_prompts(mixed_frame(), PROMPT, PLACEHOLDER_FIELDS).tolist()
+
+    assert rendered[0] == (
+        "Day: 2024-01-01 00:00:00 | When: 2024-01-01 00:00:00 | price: 1.5 | count: 1 | flag: True | name: a | <MISSING_unmapped>"
+    )
+    assert rendered[1] == (
+        "Day: 2024-01-02 00:00:00 | When: 2024-06-30 12:30:00 | price: <MISSING_price> | count: 2 | flag: False"
+        " | name: <MISSING_name> | <MISSING_unmapped>"
+    )
+    assert rendered[2].startswith("Day: <MISSING_day> | When: <MISSING_when> | price: 0.30000000000000004 |")
@@ -0,0 +1,27 @@
+from common.openai_clients import ClientRegistry, async_client_registry, client_registry
+from common.rate_limiter import AZURE_OPENAI_RPM, AZURE_OPENAI_TPM, get_rate_limiter
+
+
+def test_limiter_follows_rpm_tpm_overrides():
+    default = get_rate_limiter("https://a", "gpt-4o")
+    assert default.requests.capacity == AZURE_OPENAI_RPM
+    assert default.tokens.capacity == AZURE_OPENAI_TPM
+
+    overridden = get_rate_limiter("https://a", "gpt-4o", rpm=10, tpm="2000")
+
+    assert overridden is not default
+    assert overridden.requests.capacity == 10
+    assert overridden.tokens.capacity == 2000
+    assert get_rate_limiter("https://a", "gpt-4o", rpm="10", tpm=2000) is overridden
+    assert get_rate_limiter("https://a", "gpt-4o", rpm=AZURE_OPENAI_RPM) is default
+
+
+def test_async_clients_leave_retries_to_create_chat_completion():
+    created = []
+    registry = ClientRegistry(lambda **kwargs: created.append(kwargs) or object(), max_retries=0)
+
+    registry.get("https://a", "key")
+
+    assert created[0]["max_retries"] == 0
+    assert async_client_registry.client_options == {"max_retries": 0}
+    assert client_registry.client_options == {}
@@ -0,0 +1,189 @@
+import io
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from batch_process.steps import create_file, pipeline, stream_file
+from common import ingest
+from batch_process.steps.upload_file import write_jsonl
+
+
+DESCRIPTION = {
+    "unique_id_field": "id",
+    "prompt": "Describe {{name}}",
+    "placeholder_field": {"name": "name"},
+    "config": {"chunkSize": 1},
+    "credentials": {"deploymentName": "gpt-4o", "temperature": 0.3},
+}
+
+
+def baseline_jsonl(df):
+    # The pre-streaming path: whole file in one DataFrame
+    rendered = create_file.start_process(
+        df, DESCRIPTION["unique_id_field"], DESCRIPTION["prompt"], DESCRIPTION["placeholder_field"]
+    )
+    out = io.BytesIO()
+    write_jsonl(rendered, "prompt", "id", "gpt-4o", 0.3, out)
+    return out.getvalue()
+
+
+def read_chunks(chunks):
+    contents = []
+    for chunk in chunks:
+        chunk["file"].seek(0)
+        contents.append(chunk["file"].read())
+    return contents
+
+
+def streamed_jsonl(file, filename, chunk_rows):
+    upload = stream_file.PreparedUpload(file, filename, DESCRIPTION, chunk_rows=chunk_rows)
+    return b"".join(read_chunks(upload.jsonl_chunks(1)))
+
+
+def test_missing_id_in_later_chunk_keeps_id_dtype_of_whole_file():
+    csv = b"id,name\n1,a\n2,b\n3,c\n4,d\n,e\n6,f\n3,g\n"
+    df = pd.read_csv(io.BytesIO(csv))
+    assert df["id"].dtype == np.float64
+
+    streamed = streamed_jsonl(io.BytesIO(csv), "upload.csv", chunk_rows=3)
+
+    assert streamed == baseline_jsonl(df)
+    # The duplicate id 3 in the last chunk is dropped like in the baseline
+    assert streamed.count(b'"custom_id": 3.0') == 1
+
+
+def test_excel_missing_id_in_later_chunk_keeps_id_dtype_of_whole_file():
+    df = pd.DataFrame({"id": [1, 2, 3, 4, None, 6, 3], "name": list("abcdefg")})
+    xlsx = io.BytesIO()
+    df.to_excel(xlsx, index=False)
+
+    streamed = streamed_jsonl(xlsx, "upload.xlsx", chunk_rows=3)
+
+    xlsx.seek(0)
+    assert streamed == baseline_jsonl(pd.read_excel(xlsx))
+
+
+def test_placeholder_text_matches_whole_file():
+    # A count that is missing in a later chunk is float64 in the whole file: "1.0", not "1"
+    csv = b"id,name\n1,1\n2,2\n3,3\n4,\n5,1.50\n"
+    df = pd.read_csv(io.BytesIO(csv))
+
+    streamed = streamed_jsonl(io.BytesIO(csv), "upload.csv", chunk_rows=3)
+
+    assert streamed == baseline_jsonl(df)
+    assert b"Describe 1.0" in streamed
+    assert b"Describe 1.5" in streamed
+
+
+def test_excel_datetime_placeholder_keeps_str_formatting():
+    df = pd.DataFrame({"id": [1, 2, 3], "name": pd.to_datetime(["2024-01-01", "2024-01-02", None])})
+    xlsx = io.BytesIO()
+    df.to_excel(xlsx, index=False)
+
+    streamed = streamed_jsonl(xlsx, "upload.xlsx", chunk_rows=2)
+
+    xlsx.seek(0)
+    assert streamed == baseline_jsonl(pd.read_excel(xlsx))
+    assert b"Describe 2024-01-01 00:00:00" in streamed
+
+
+def test_excel_keeps_empty_rows_between_data_rows():
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in [["id", "name"], [1, "a"], [None, None], [3, "c"]]:
+        sheet.append(row)
+    # Formatted but empty cells below the data are read as empty rows
+    sheet.cell(row=8, column=2).font = Font(bold=True)
+    xlsx = io.BytesIO()
+    workbook.save(xlsx)
+
+    chunks = list(ingest.iter_upload_chunks(xlsx, "upload.xlsx", chunk_rows=2))
+
+    xlsx.seek(0)
+    expected = pd.read_excel(xlsx)
+    assert len(expected) == 3
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+def test_legacy_xls_goes_through_read_excel(monkeypatch):
+    df = pd.DataFrame({"id": [1, 2, 3], "name": ["a", "b", "c"]})
+    calls = []
+
+    def read_excel(file, nrows=None, usecols=None):
+        calls.append(file.read(8))
+        file.seek(0)
+        columns = usecols or list(df.columns)
+        return df[columns] if nrows is None else df[columns].head(nrows)
+
+    monkeypatch.setattr(pd, "read_excel", read_excel)
+    # The OLE2 signature of the binary .xls format
+    xls = io.BytesIO(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\0" * 64)
+
+    assert streamed_jsonl(xls, "upload.xls", chunk_rows=2) == baseline_jsonl(df.copy())
+    assert calls and all(signature.startswith(b"\xd0\xcf") for signature in calls)
+
+
+def test_chunks_split_the_rows_of_the_file():
+    csv = b"id,name\n" + b"".join(b"%d,n%d\n" % (i, i) for i in range(1, 8))
+    upload = stream_file.PreparedUpload(io.BytesIO(csv), "upload.csv", DESCRIPTION, chunk_rows=3)
+
+    chunks = list(upload.jsonl_chunks(3))
+
+    assert [(chunk["chunk_no"], chunk["rows"]) for chunk in chunks] == [("chunk_1", 2), ("chunk_2", 2), ("chunk_3", 3)]
+    assert b"".join(read_chunks(chunks)) == baseline_jsonl(pd.read_csv(io.BytesIO(csv)))
+    assert upload.summary()["total_rows"] == 7
+
+
+def test_chunks_are_counted_on_the_rows_of_the_file():
+    # Dropped rows leave their chunk smaller (or empty, then it is skipped)
+    csv = b"id,name\n1,a\n1,b\n1,c\n4,d\n5,e\n6,f\n"
+    upload = stream_file.PreparedUpload(io.BytesIO(csv), "upload.csv", DESCRIPTION)
+
+    chunks = list(upload.jsonl_chunks(3))
+
+    assert [(chunk["chunk_no"], chunk["rows"]) for chunk in chunks] == [("chunk_1", 1), ("chunk_2", 1), ("chunk_3", 2)]
+    assert upload.summary()["dropped_rows"]["duplicate_id"] == 2
+
+
+def test_first_upload_starts_before_the_last_chunk_is_rendered(monkeypatch):
+    events = []
+    uploaded = threading.Event()
+
+    class Files:
+        def create(self, file, purpose):
+            events.append("upload")
+            uploaded.set()
+            return SimpleNamespace(id=f"file_{events.count('upload')}")
+
+        def retrieve(self, file_id):
+            return SimpleNamespace(status="processed")
+
+    monkeypatch.setattr(pipeline, "get_azure_client", lambda endpoint, api_key: SimpleNamespace(files=Files()))
+    render_prompts = stream_file.render_prompts
+
+    def rendering(df, *args):
+        if events.count("render") == 2:
+            # The last of 3 chunks: give the first upload the time to start
+            uploaded.wait(timeout=5)
+        events.append("render")
+        return render_prompts(df, *args)
+
+    monkeypatch.setattr(stream_file, "render_prompts", rendering)
+    description = {
+        **DESCRIPTION,
+        "config": {"chunkSize": 3},
+        "credentials": {**DESCRIPTION["credentials"], "endpoint": "https://a", "apiKey": "key"},
+    }
+    csv = b"id,name\n" + b"".join(b"%d,n%d\n" % (i, i) for i in range(1, 7))
+
+    upload, chunks = stream_file.start_process(io.BytesIO(csv), "upload.csv", description)
+    results = pipeline.start_process(chunks, "upload.csv", description)
+
+    assert [result["file_id"] for result in results] and all(result["status"] == "processed" for result in results)
+    assert events.index("upload") < len(events) - 1 - events[::-1].index("render")
+    assert upload.summary()["total_rows"] == 6
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from database import repository
+from login_setup import tokens
+from login_setup.tokens import AUTH_TOKEN_TTL, RevocationList
+
+
+@pytest.fixture
+def shared_table(monkeypatch):
+    # Stands in for revoked_tokens_AI_Portal, shared by the RevocationLists of all "workers"
+    rows = []
+
+    def add_token_revocation(expires_at, jti=None, user_id=None, issued_before=None):
+        rows.append({"jti": jti, "user_id": user_id, "issued_before": issued_before, "expires_at": expires_at})
+        return {"status_code": 200, "message": None}
+
+    def get_token_revocations(now):
+        return [dict(row) for row in rows if row["expires_at"] >= now]
+
+    def delete_expired_token_revocations(now):
+        rows[:] = [row for row in rows if row["expires_at"] >= now]
+        return {"status_code": 200, "message": None}
+
+    monkeypatch.setattr(repository, "add_token_revocation", add_token_revocation)
+    monkeypatch.setattr(repository, "get_token_revocations", get_token_revocations)
+    monkeypatch.setattr(repository, "delete_expired_token_revocations", delete_expired_token_revocations)
+    return rows
+
+
+def claims(sub="7", jti="t1", iat=None):
+    return {"sub": sub, "jti": jti, "iat": iat if iat is not None else time.time() - 1}
+
+
+def test_logout_on_one_worker_applies_to_the_others(shared_table):
+    worker_a, worker_b = RevocationList(refresh_interval=0), RevocationList(refresh_interval=0)
+    assert not worker_b.is_revoked(claims())
+
+    worker_a.revoke_token("t1", time.time() + 60)
+
+    assert worker_a.is_revoked(claims())
+    assert worker_b.is_revoked(claims())
+    assert not worker_b.is_revoked(claims(jti="t2"))
+
+
+def test_user_revocation_applies_to_older_tokens_only(shared_table):
+    worker_a, worker_b = RevocationList(refresh_interval=0), RevocationList(refresh_interval=0)
+    cut_off = time.time()
+
+    worker_a.revoke_user(7, issued_before=cut_off)
+
+    assert worker_b.is_revoked(claims(iat=cut_off - 10))
+    assert not worker_b.is_revoked(claims(iat=cut_off + 10))
+    assert shared_table[0]["expires_at"] == cut_off + AUTH_TOKEN_TTL
+
+
+def test_reload_waits_for_refresh_interval(shared_table):
+    worker_a, worker_b = RevocationList(refresh_interval=0), RevocationList(refresh_interval=3600)
+    assert not worker_b.is_revoked(claims())
+
+    worker_a.revoke_token("t1", time.time() + 60)
+
+    assert not worker_b.is_revoked(claims())
+    worker_b.refresh()
+    assert worker_b.is_revoked(claims())
+
+
+def test_expired_revocations_are_dropped(shared_table):
+    worker = RevocationList(refresh_interval=0)
+    worker.revoke_token("old", time.time() - 1)
+    worker.revoke_token("t1", time.time() + 60)
+
+    assert worker.is_revoked(claims())
+    assert [row["jti"] for row in shared_table] == ["t1"]
+
+
+def test_failed_reload_keeps_known_revocations(shared_table, monkeypatch):
+    worker = RevocationList(refresh_interval=0)
+    worker.revoke_token("t1", time.time() + 60)
+
+    def unavailable(now):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(repository, "get_token_revocations", unavailable)
+
+    assert worker.is_revoked(claims())
+
+
+def test_signed_token_fits_the_access_token_column(shared_table, monkeypatch):
+    monkeypatch.setattr(tokens, "AUTH_TOKEN_SECRET", "secret")
+
+    token = tokens.issue_token("3f2b8c1e-9d4a-4f6b-8e2a-1c5d7e9f0a3b", "admin")
+
+    assert 200 < len(token) <= tokens.ACCESS_TOKEN_MAX_LENGTH
+    assert tokens.verify_token(token)["role"] == "admin"
+    with pytest.raises(ValueError):
+        tokens.issue_token("x" * 400, "admin")
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from database import tracked_frame
+from database.tracked_frame import TrackedDataFrame, is_tracked
+
+
+def tracked():
+    return TrackedDataFrame.track(pd.DataFrame({"id": [1, 2], "status": ["active", "active"]}), "id")
+
+
+def test_frames_keeping_the_snapshot_are_tracked():
+    df = tracked()
+    df.loc[df["id"] == 2, "status"] = "inactive"
+
+    assert is_tracked(df)
+    assert is_tracked(df[df["status"] == "active"])
+    assert is_tracked(df.assign(role="user"))
+    new_rows, changed_cells = df.changes()
+    assert new_rows.empty and changed_cells == {2: {"status": "inactive"}}
+
+
+def test_derived_frames_without_snapshot_are_not_tracked():
+    df = tracked()
+
+    assert not is_tracked(pd.concat([df, pd.DataFrame({"id": [3], "status": ["active"]})]))
+    assert not is_tracked(df.merge(df, on="id"))
+    assert not is_tracked(pd.DataFrame(df))
+    # A plain frame with a column named like the snapshot attribute
+    assert not is_tracked(pd.DataFrame({"original": [1], "key_column": ["id"]}))
+
+
+class FakeDB:
+    def __init__(self, update_status=200):
+        self.update_status = update_status
+        self.updates = []
+        self.inserts = []
+
+    def fetch(self, query, params=None):
+        return {"status_code": 200, "data": []}
+
+    def bulk_update(self, table, key_column, rows):
+        self.updates.append(rows)
+        return {"status_code": self.update_status, "status": "failed" if self.update_status >= 300 else "success", "message": None}
+
+    def bulk_insert(self, table, columns, rows):
+        self.inserts.append(rows)
+        return {"status_code": 200, "status": "success", "message": None}
+
+    def close_connection(self):
+        pass
+
+
+def test_failed_write_keeps_the_changes(monkeypatch):
+    db = FakeDB(update_status=500)
+    monkeypatch.setattr(tracked_frame, "ConnectDB", lambda: db)
+    df = tracked()
+    df.loc[df["id"] == 2, "status"] = "inactive"
+
+    with pytest.raises(RuntimeError):
+        tracked_frame.write_tracked_changes("users_AI_Portal", df)
+
+    # Still dirty: the next write sends the same delta again
+    db.update_status = 200
+    assert tracked_frame.write_tracked_changes("users_AI_Portal", df) == {2: {"status": "inactive"}}
+    assert db.updates[0] == db.updates[1] == [{"id": 2, "status": "inactive"}]
+    assert df.changes()[1] == {}
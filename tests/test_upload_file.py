@@ -0,0 +1,66 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_process.steps import upload_file
+from batch_process.steps.upload_file import write_jsonl
+
+
+PROMPTS = ["plain", "ü ß 日本 😀", 'quote " backslash \\ slash /', "tab\tnew\nline\r\x00\x1f", ""]
+
+
+def iterrows_jsonl(df, prompt_col_name, unique_id_col_name, model_name, temperature):
+    # The serializer write_jsonl replaced: json.dumps of one request per iterrows row
+    out = io.BytesIO()
+    for _, row in df.iterrows():
+        json_object = {
+            "custom_id": row[unique_id_col_name],
+            "method": "POST",
+            "url": "/chat/completions",
+            "body": {
+                "model": model_name,
+                "temperature": temperature,
+                "messages": [
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": row[prompt_col_name]},
+                ],
+            },
+        }
+        out.write((json.dumps(json_object) + "\n").encode("utf-8"))
+    return out.getvalue()
+
+
+def fast_jsonl(df, prompt_col_name, unique_id_col_name, model_name, temperature):
+    out = io.BytesIO()
+    write_jsonl(df, prompt_col_name, unique_id_col_name, model_name, temperature, out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize(
+    "ids",
+    [
+        pd.Series([1, 2, 3, 4, 5], dtype="int64"),
+        pd.Series([1.0, np.nan, 3.5, 1e20, -0.0], dtype="float64"),
+        pd.Series(["a", "ü", 'q"\\', "7", ""], dtype="string"),
+        pd.Series(["a", "b", "c", "d", "e"], dtype=object),
+        pd.Series([True, False, True, False, True], dtype="bool"),
+    ],
+    ids=["int", "float-nan", "string", "object", "bool"],
+)
+@pytest.mark.parametrize("temperature", [0.3, 1, None])
+def test_write_jsonl_matches_iterrows_json_dumps(ids, temperature):
+    df = pd.DataFrame({"id": ids, "prompt": PROMPTS, "count": range(5)})
+
+    expected = iterrows_jsonl(df, "prompt", "id", "gpt-4o é", temperature)
+
+    assert fast_jsonl(df, "prompt", "id", "gpt-4o é", temperature) == expected
+
+
+def test_write_jsonl_across_write_batches(monkeypatch):
+    monkeypatch.setattr(upload_file, "JSONL_WRITE_ROWS", 2)
+    df = pd.DataFrame({"id": range(5), "prompt": pd.Series(PROMPTS, dtype="string")})
+
+    assert fast_jsonl(df, "prompt", "id", "gpt-4o", 0.3) == iterrows_jsonl(df, "prompt", "id", "gpt-4o", 0.3)